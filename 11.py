@@ -1,206 +1,58 @@
-import psycopg2
-import csv
+import sys
+from psycopg2 import errors
+from db import connection, transaction, close_pool
+from bulk_load import bulk_load_csv, print_load_report
+from parallel_load import parallel_load_csv, print_worker_report
+from fast_csv import read_contacts
+from migrations import migrate
+from search import SEARCH_MODES, DEFAULT_LIMIT
+from export import stream_rows, export_query, EXPORT_FORMATS
+from cache import cached_search, invalidate_contacts, invalidate_all
+from query_stats import print_query_stats, export_query_stats
+from phones import phone_key
+from bulk_edit import read_identifiers, read_changes, print_rejects, print_bulk_report
 
-# Database connection
-conn = psycopg2.connect(
-    host="localhost",
-    database="postgres",
-    user="postgres",
-    password="Post9992k"
-)
-
-cur = conn.cursor()
-
-# Drop and recreate phonebook
-cur.execute("DROP TABLE IF EXISTS phonebook CASCADE;")
-cur.execute("""
-CREATE TABLE phonebook (
-    id SERIAL PRIMARY KEY,
-    first_name VARCHAR(50) NOT NULL UNIQUE,
-    phone VARCHAR(20) NOT NULL UNIQUE
-)
-""")
-
-# Other tables
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id SERIAL PRIMARY KEY,
-    username VARCHAR(50) UNIQUE NOT NULL
-)
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS user_score (
-    id SERIAL PRIMARY KEY,
-    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-    score INTEGER DEFAULT 0,
-    level INTEGER DEFAULT 1
-)
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS leaderboard (
-    id SERIAL PRIMARY KEY,
-    username VARCHAR(50),
-    score INTEGER,
-    level INTEGER,
-    created_at TIMESTAMP DEFAULT NOW()
-)
-""")
-
-# Drop old objects
-cur.execute("DROP FUNCTION IF EXISTS search_phonebook(TEXT);")
-cur.execute("DROP FUNCTION IF EXISTS get_phonebook_paged(INTEGER, INTEGER);")
-cur.execute("DROP FUNCTION IF EXISTS get_all_phonebook_ordered();")
-cur.execute("DROP PROCEDURE IF EXISTS insert_many_users(TEXT[], TEXT[]);")
-cur.execute("DROP PROCEDURE IF EXISTS upsert_phonebook_user(VARCHAR, VARCHAR);")
-cur.execute("DROP PROCEDURE IF EXISTS delete_user(TEXT);")
-
-# Functions
-cur.execute("""
-CREATE OR REPLACE FUNCTION search_phonebook(pattern TEXT)
-RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    RETURN QUERY
-    SELECT
-        ROW_NUMBER() OVER (ORDER BY phonebook.id),
-        phonebook.first_name,
-        phonebook.phone
-    FROM phonebook
-    WHERE phonebook.first_name ILIKE '%' || pattern || '%'
-       OR phonebook.phone ILIKE '%' || pattern || '%';
-END;
-$$;
-""")
-
-cur.execute("""
-CREATE OR REPLACE FUNCTION get_phonebook_paged(p_limit INT, p_offset INT)
-RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    RETURN QUERY
-    SELECT
-        sub.row_number,
-        sub.first_name,
-        sub.phone
-    FROM (
-        SELECT
-            ROW_NUMBER() OVER (ORDER BY phonebook.id) AS row_number,
-            phonebook.first_name,
-            phonebook.phone
-        FROM phonebook
-    ) AS sub
-    ORDER BY sub.row_number
-    LIMIT p_limit
-    OFFSET p_offset;
-END;
-$$;
-""")
-
-cur.execute("""
-CREATE OR REPLACE FUNCTION get_all_phonebook_ordered()
-RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    RETURN QUERY
-    SELECT
-        ROW_NUMBER() OVER (ORDER BY phonebook.id),
-        phonebook.first_name,
-        phonebook.phone
-    FROM phonebook;
-END;
-$$;
-""")
-
-# Procedures
-cur.execute("""
-CREATE OR REPLACE PROCEDURE upsert_phonebook_user(p_name VARCHAR, p_phone VARCHAR)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    INSERT INTO phonebook (first_name, phone)
-    VALUES (p_name, p_phone)
-    ON CONFLICT (first_name)
-    DO UPDATE SET phone = EXCLUDED.phone;
-END;
-$$;
-""")
-
-cur.execute("""
-CREATE OR REPLACE PROCEDURE insert_many_users(
-    IN names TEXT[],
-    IN phones TEXT[]
-)
-LANGUAGE plpgsql
-AS $$
-DECLARE
-    i INT;
-    phone_pattern CONSTANT TEXT := '^[0-9\\-\\+]+$';
-BEGIN
-    FOR i IN array_lower(names, 1)..array_upper(names, 1) LOOP
-        IF phones[i] ~ phone_pattern THEN
-            BEGIN
-                INSERT INTO phonebook(first_name, phone)
-                VALUES(names[i], phones[i])
-                ON CONFLICT (first_name)
-                DO UPDATE SET phone = EXCLUDED.phone;
-            EXCEPTION WHEN others THEN
-                RAISE NOTICE 'Invalid entry: % - %', names[i], phones[i];
-            END;
-        ELSE
-            RAISE NOTICE 'Invalid phone format: % - %', names[i], phones[i];
-        END IF;
-    END LOOP;
-END;
-$$;
-""")
-
-cur.execute("""
-CREATE OR REPLACE PROCEDURE delete_user(p_identifier TEXT)
-LANGUAGE plpgsql
-AS $$
-BEGIN
-    DELETE FROM phonebook
-    WHERE first_name = p_identifier
-       OR phone = p_identifier;
-END;
-$$;
-""")
-
-conn.commit()
+# Schema setup: applies only the migrations this database is missing
+def setup_schema():
+    try:
+        with connection() as conn:
+            for component, version, description in migrate(conn, ("core", "procedures")):
+                print(f"Applied migration {component} {version}: {description}")
+    except errors.RaiseException as e:
+        # A migration refused to run on this data (e.g. repeated first names)
+        print("Schema setup stopped:", e.diag.message_primary)
+        close_pool()
+        sys.exit(1)
 
 # Interaction functions
 def insert_from_csv():
     path = input("Enter CSV file path: ")
-    with open(path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if len(row) != 2:
-                print("Invalid row:", row)
-                continue
-            first_name, phone = row
-            try:
-                cur.execute(
-                    "INSERT INTO phonebook (first_name, phone) VALUES (%s, %s) ON CONFLICT (first_name) DO UPDATE SET phone=EXCLUDED.phone",
-                    (first_name, phone)
-                )
-            except Exception as e:
-                conn.rollback()
-                print("Error inserting:", e)
-    conn.commit()
+    workers = input("Parallel workers (or press Enter for a single process): ").strip()
+    try:
+        with connection() as conn:
+            if workers.isdigit() and int(workers) > 0:
+                stats = parallel_load_csv(conn, path, "first_name", workers=int(workers))
+            else:
+                stats = bulk_load_csv(conn, path, "first_name")
+    except Exception as e:
+        print("Error inserting:", e)
+        return
+    finally:
+        # Chunks commit as they go, so even a failed import may have written rows
+        invalidate_all()
+    print_load_report(stats)
+    print_worker_report(stats)
     print("CSV data inserted.")
 
 def insert_from_console():
     first_name = input("Name: ").strip()
     phone = input("Phone: ").strip()
     try:
-        cur.execute("CALL upsert_phonebook_user(%s, %s)", (first_name, phone))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("CALL upsert_phonebook_user(%s, %s)", (first_name, phone))
+        invalidate_contacts(names=[first_name], phones=[phone])
         print("Inserted or updated successfully.")
     except Exception as e:
-        conn.rollback()
         print("Error inserting:", e)
 
 def update_user():
@@ -218,120 +70,230 @@ def update_user():
     if not set_clauses:
         print("Nothing to update.")
         return
-    values.extend([old_phone_or_name, old_phone_or_name])
+    values.extend([phone_key(old_phone_or_name), old_phone_or_name])
     sql = f"""
     UPDATE phonebook
     SET {', '.join(set_clauses)}
-    WHERE phone=%s OR first_name=%s
+    WHERE phone_norm=%s OR first_name=%s
     """
     try:
-        cur.execute(sql, values)
-        conn.commit()
-        if cur.rowcount > 0:
+        with transaction() as cur:
+            cur.execute(sql, values)
+            updated = cur.rowcount
+        invalidate_contacts(names=[old_phone_or_name, new_name], phones=[old_phone_or_name, new_phone])
+        if updated > 0:
             print("Data updated.")
         else:
             print("No records matched.")
     except Exception as e:
-        conn.rollback()
         print("Error updating:", e)
 
 def query_users():
     try:
-        cur.execute("SELECT * FROM get_all_phonebook_ordered()")
-        rows = cur.fetchall()
-        if not rows:
-            print("Phonebook is empty.")
-        else:
-            for row in rows:
+        empty = True
+        with connection() as conn:
+            for row in stream_rows(conn, "SELECT * FROM get_all_phonebook_ordered()"):
+                empty = False
                 print(f"{row[0]}. {row[1]} - {row[2]}")
+        if empty:
+            print("Phonebook is empty.")
     except Exception as e:
-        conn.rollback()
         print("Error querying:", e)
 
+def export_phonebook():
+    path = input("Enter export file path: ").strip()
+    fmt = input(f"Format {'/'.join(EXPORT_FORMATS)} (Enter for csv): ").strip() or "csv"
+    try:
+        with connection() as conn:
+            count = export_query(
+                conn, "SELECT * FROM get_all_phonebook_ordered()",
+                path, ["row_number", "first_name", "phone"], fmt
+            )
+        print(f"Exported {count} rows to {path}.")
+    except Exception as e:
+        print("Error exporting:", e)
+
 def delete_user_python():
     identifier = input("Enter name or phone to delete: ").strip()
     try:
-        cur.execute("DELETE FROM phonebook WHERE first_name=%s OR phone=%s", (identifier, identifier))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute(
+                "DELETE FROM phonebook WHERE first_name=%s OR phone_norm=%s",
+                (identifier, phone_key(identifier))
+            )
+        invalidate_contacts(names=[identifier], phones=[identifier])
         print("User(s) deleted (Python).")
     except Exception as e:
-        conn.rollback()
         print("Error deleting:", e)
 
 def search_users_by_pattern():
     pattern = input("Enter pattern to search: ").strip()
+    mode = input(f"Search mode {'/'.join(SEARCH_MODES)} (Enter for substring): ").strip() or "substring"
     try:
-        cur.execute("SELECT * FROM search_phonebook(%s)", (pattern,))
-        rows = cur.fetchall()
+        def fetch():
+            with transaction() as cur:
+                cur.execute("SELECT * FROM search_phonebook(%s, %s, %s)", (pattern, mode, DEFAULT_LIMIT))
+                return cur.fetchall()
+        rows = cached_search(("search_phonebook", pattern, mode, DEFAULT_LIMIT), fetch)
         if not rows:
             print("No matches found.")
         else:
             for row in rows:
                 print(f"{row[0]}. {row[1]} - {row[2]}")
     except Exception as e:
-        conn.rollback()
         print("Error searching:", e)
 
 def upsert_user():
     name = input("Enter name: ").strip()
     phone = input("Enter phone: ").strip()
     try:
-        cur.execute("CALL upsert_phonebook_user(%s, %s)", (name, phone))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("CALL upsert_phonebook_user(%s, %s)", (name, phone))
+        invalidate_contacts(names=[name], phones=[phone])
         print("User inserted or updated.")
     except Exception as e:
-        conn.rollback()
         print("Error upserting:", e)
 
 def insert_many_users():
     names = []
     phones = []
-    print("Enter users (empty name to finish):")
-    while True:
-        name = input("Name: ").strip()
-        if not name:
-            break
-        phone = input("Phone: ").strip()
-        names.append(name)
-        phones.append(phone)
+    path = input("Read users from CSV file (or press Enter to type them): ").strip()
+    if path:
+        try:
+            for line, name, phone in read_contacts(path):
+                names.append(name)
+                phones.append(phone)
+        except (OSError, UnicodeDecodeError) as e:
+            print("Error reading file:", e)
+            return
+    else:
+        print("Enter users (empty name to finish):")
+        while True:
+            name = input("Name: ").strip()
+            if not name:
+                break
+            phone = input("Phone: ").strip()
+            names.append(name)
+            phones.append(phone)
     if not names:
         print("No users to insert.")
         return
     try:
-        cur.execute("CALL insert_many_users(%s::text[], %s::text[])", (names, phones))
-        conn.commit()
-        print("Users inserted successfully.")
+        with transaction() as cur:
+            cur.execute("SELECT * FROM insert_many_users(%s::text[], %s::text[])", (names, phones))
+            rejected = cur.fetchall()
+        invalidate_contacts(names=names, phones=phones)
+        print(f"{len(names) - len(rejected)} of {len(names)} users accepted.")
+        for name, phone, reason in rejected:
+            print(f"Rejected: {name} - {phone} ({reason})")
     except Exception as e:
-        conn.rollback()
         print("Error inserting many users:", e)
 
+def fetch_page(after_id=0, limit=10):
+    # A zero or negative LIMIT would fail in Postgres or leave no last row
+    # to continue from, so it never reaches the query
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit <= 0:
+        raise ValueError(f"Page size must be a positive integer, got {limit!r}")
+    with transaction() as cur:
+        cur.execute("SELECT * FROM get_phonebook_after(%s, %s)", (after_id, limit))
+        rows = cur.fetchall()
+    next_cursor = rows[-1][0] if len(rows) == limit else None
+    return rows, next_cursor
+
 def query_with_pagination():
-    limit = int(input("Enter limit: "))
-    offset = int(input("Enter offset: "))
+    limit = input("Enter page size: ").strip()
+    if not limit.isdigit() or int(limit) <= 0:
+        print("Page size must be a positive whole number.")
+        return
+    limit = int(limit)
+    # Start id of every page seen so far, so paging back needs no OFFSET either
+    cursors = [0]
     try:
-        cur.execute("SELECT * FROM get_phonebook_paged(%s, %s)", (limit, offset))
-        rows = cur.fetchall()
-        if not rows:
-            print("No data to show.")
-        else:
-            for row in rows:
-                print(f"{row[0]}. {row[1]} - {row[2]}")
+        while True:
+            rows, next_cursor = fetch_page(cursors[-1], limit)
+            if not rows:
+                print("No data to show.")
+            else:
+                for row in rows:
+                    print(f"{row[0]}. {row[1]} - {row[2]}")
+            action = input("[n]ext, [p]revious, [q]uit: ").strip().lower()
+            if action == "n":
+                if next_cursor is None:
+                    print("This is the last page.")
+                else:
+                    cursors.append(next_cursor)
+            elif action == "p":
+                if len(cursors) > 1:
+                    cursors.pop()
+                else:
+                    print("This is the first page.")
+            elif action == "q":
+                break
     except Exception as e:
-        conn.rollback()
         print("Error querying pagination:", e)
 
 def delete_user_procedure():
     identifier = input("Enter name or phone to delete: ").strip()
     try:
-        cur.execute("CALL delete_user(%s)", (identifier,))
-        conn.commit()
+        with transaction() as cur:
+            cur.execute("CALL delete_user(%s)", (identifier,))
+        invalidate_contacts(names=[identifier], phones=[identifier])
         print("User(s) deleted (Procedure).")
     except Exception as e:
-        conn.rollback()
         print("Error deleting:", e)
 
+def bulk_delete_procedure():
+    path = input("File with one name or phone per line: ").strip()
+    try:
+        identifiers = read_identifiers(path)
+    except (OSError, UnicodeDecodeError) as e:
+        print("Error reading file:", e)
+        return
+    try:
+        with transaction() as cur:
+            cur.execute("SELECT * FROM delete_users(%s::text[])", (identifiers,))
+            results = cur.fetchall()
+        invalidate_contacts(names=identifiers, phones=identifiers)
+        print_bulk_report(results, "deleted")
+    except Exception as e:
+        print("Error deleting:", e)
+
+def bulk_update_procedure():
+    path = input("CSV file of name or phone,new name,new phone: ").strip()
+    try:
+        changes, rejects = read_changes(path)
+    except (OSError, UnicodeDecodeError) as e:
+        print("Error reading file:", e)
+        return
+    print_rejects(rejects)
+    identifiers = [c[0] for c in changes]
+    new_names = [c[1] for c in changes]
+    new_phones = [c[2] for c in changes]
+    try:
+        with transaction() as cur:
+            cur.execute(
+                "SELECT * FROM update_users(%s::text[], %s::text[], %s::text[])",
+                (identifiers, new_names, new_phones)
+            )
+            results = cur.fetchall()
+        invalidate_contacts(names=identifiers + new_names, phones=identifiers + new_phones)
+        print_bulk_report(results, "updated")
+    except Exception as e:
+        print("Error updating:", e)
+
+def show_query_stats():
+    print_query_stats()
+    path = input("Export full stats to JSON file (or press Enter to skip): ").strip()
+    if path:
+        try:
+            count = export_query_stats(path)
+            print(f"Exported stats for {count} statements to {path}")
+        except OSError as e:
+            print("Error exporting stats:", e)
+
 # Main Menu
 if __name__ == "__main__":
+    setup_schema()
     while True:
         print("\nMain Menu:")
         print("1. Insert from CSV")
@@ -343,7 +305,11 @@ if __name__ == "__main__":
         print("8. Insert Many Users")
         print("9. Query with Pagination")
         print("10. Delete User")
-        print("11. Exit")
+        print("11. Export Phonebook")
+        print("12. Query Stats")
+        print("13. Bulk Delete")
+        print("14. Bulk Update")
+        print("15. Exit")
         choice = input("Choose option: ")
 
         if choice == "1":
@@ -367,9 +333,16 @@ if __name__ == "__main__":
         elif choice == "10":
             delete_user_procedure()
         elif choice == "11":
+            export_phonebook()
+        elif choice == "12":
+            show_query_stats()
+        elif choice == "13":
+            bulk_delete_procedure()
+        elif choice == "14":
+            bulk_update_procedure()
+        elif choice == "15":
             break
         else:
             print("Invalid choice. Try again.")
 
-    cur.close()
-    conn.close()
+    close_pool()
@@ -0,0 +1,398 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+DEFAULT_SCHEMA = "phonebook_bench"
+
+# Runs against a scratch schema so the real phonebook is never touched. Must be
+# set before db opens its pool; every pooled connection inherits it.
+if __name__ == "__main__":
+    _schema = os.environ.get("PHONEBOOK_BENCH_SCHEMA", DEFAULT_SCHEMA)
+    os.environ["PGOPTIONS"] = f"-c search_path={_schema},public"
+
+from db import connection, close_pool
+from bulk_load import bulk_load_csv
+from migrations import migrate, SCHEMA_VERSION_SQL
+from search import SEARCH_MODES, search_phonebook
+
+FIRST_NAMES = [
+    "Alihan", "Aruzhan", "Nurlan", "Dana", "Yerlan", "Aigerim", "Daniyar", "Madina",
+    "Askar", "Zhanna", "Timur", "Saule", "Arman", "Aliya", "Bauyrzhan", "Gulnara",
+    "Dias", "Kamila", "Yerassyl", "Ainur", "Sanzhar", "Dinara", "Nursultan", "Asel",
+    "Almas", "Togzhan", "Miras", "Akbota", "Rustem", "Zarina", "Ivan", "Anna",
+    "Dmitry", "Olga", "Sergey", "Elena", "Maxim", "Irina", "Pavel", "Natalia",
+]
+LAST_NAMES = [
+    "Nurlanov", "Akhmetov", "Suleimenov", "Omarov", "Bekov", "Zhakupov", "Iskakov",
+    "Serikbayev", "Tokayev", "Abenov", "Karimov", "Sadykov", "Mukanov", "Kassymov",
+    "Baimukhamedov", "Yesenov", "Dzhaksybekov", "Utegenov", "Tulegenov", "Aliyev",
+    "Ivanov", "Petrov", "Smirnov", "Kuznetsov", "Popov", "Volkov", "Sokolov",
+    "Lebedev", "Kozlov", "Novikov",
+]
+# Kazakhstan mobile operator codes, as in contacts.csv (8 7xx xxx xx xx)
+OPERATOR_CODES = ["700", "701", "702", "705", "707", "708", "747", "771", "775", "776", "777", "778"]
+
+PHONE_SPACE = len(OPERATOR_CODES) * 10_000_000
+# Multiplier coprime to PHONE_SPACE: index -> phone is a permutation, so
+# phones are unique and scattered without keeping a set of them in memory
+PHONE_STRIDE = 7_368_787
+
+DEFAULT_SIZES = [10_000, 100_000]
+DEFAULT_SAMPLES = 500
+DEFAULT_BATCH = 1_000
+
+
+# Synthetic data
+def synthetic_contact(i, seed=0):
+    combos = len(FIRST_NAMES) * len(LAST_NAMES)
+    first = FIRST_NAMES[i % len(FIRST_NAMES)]
+    last = LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]
+    name = f"{first} {last}"
+    if i >= combos:
+        name += f" {i // combos}"
+    n = (i * PHONE_STRIDE + seed) % PHONE_SPACE
+    phone = f"8{OPERATOR_CODES[n // 10_000_000]}{n % 10_000_000:07d}"
+    return name, phone
+
+
+def generate_dataset(path, rows, seed=0, duplicate_rate=0.01):
+    # "Name, 87xxxxxxxxx" like contacts.csv; a small share of rows reuses the
+    # previous phone so the loaders' duplicate handling is exercised too
+    rng = random.Random(seed)
+    with open(path, "w", newline='', encoding='utf-8') as f:
+        writer = csv.writer(f, lineterminator="\n")
+        phone = None
+        for i in range(rows):
+            name, new_phone = synthetic_contact(i, seed)
+            if phone is not None and rng.random() < duplicate_rate:
+                new_phone = phone
+            phone = new_phone
+            writer.writerow((name, " " + phone))
+
+
+def dataset_path(data_dir, rows, seed):
+    path = os.path.join(data_dir, f"phonebook_bench_{rows}_{seed}.csv")
+    if not os.path.exists(path):
+        print(f"Generating {rows} contacts -> {path}")
+        started = time.perf_counter()
+        generate_dataset(path, rows, seed)
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+    return path
+
+
+# Measurement
+def percentile(sorted_values, pct):
+    # Nearest-rank percentile
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, rows=None):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    result = {
+        "count": len(latencies),
+        "seconds": total,
+        "ops_per_sec": len(latencies) / total if total > 0 else None,
+        "mean_ms": total / len(latencies) * 1000 if latencies else None,
+        "p50_ms": percentile(latencies, 50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 95) * 1000 if latencies else None,
+        "p99_ms": percentile(latencies, 99) * 1000 if latencies else None,
+        "max_ms": latencies[-1] * 1000 if latencies else None,
+    }
+    if rows is not None:
+        result["rows"] = rows
+        result["rows_per_sec"] = rows / total if total > 0 else None
+    return result
+
+
+def timed_calls(conn, calls):
+    # Each call is one statement plus its commit, as the menu scripts do it
+    latencies = []
+    with conn.cursor() as cur:
+        for sql, params in calls:
+            started = time.perf_counter()
+            cur.execute(sql, params)
+            if cur.description:
+                cur.fetchall()
+            conn.commit()
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def reset_schema(conn, schema, components):
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        cur.execute(f"CREATE SCHEMA {schema}")
+        # An empty schema_version here shadows public's, or migrate() would
+        # read public's versions, create nothing and leave every unqualified
+        # name resolving to the real tables
+        cur.execute(f"SET LOCAL search_path = {schema}")
+        cur.execute(SCHEMA_VERSION_SQL)
+    conn.commit()
+    with conn.cursor() as cur:
+        cur.execute("SELECT current_schema()")
+        current = cur.fetchone()[0]
+    conn.commit()
+    if current != schema:
+        raise RuntimeError(f"search_path starts at {current}, not the bench schema {schema}; is PGOPTIONS set?")
+    # Core needs public on the path for pg_trgm's operator classes. The
+    # procedures step opens by dropping legacy routines IF EXISTS, which with
+    # public on the path would find and drop the real ones, so it runs with
+    # the bench schema alone; RESET goes back to the PGOPTIONS path.
+    migrate(conn, ("core",))
+    if "procedures" in components:
+        with conn.cursor() as cur:
+            cur.execute(f"SET search_path = {schema}")
+        conn.commit()
+        try:
+            migrate(conn, ("procedures",))
+        finally:
+            with conn.cursor() as cur:
+                cur.execute("RESET search_path")
+            conn.commit()
+    check_bench_schema(conn, schema)
+
+
+def check_bench_schema(conn, schema):
+    # Refuse to time any write unless phonebook resolves inside the scratch schema
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT n.nspname
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE c.oid = to_regclass('phonebook')
+        """)
+        row = cur.fetchone()
+    conn.commit()
+    if row is None or row[0] != schema:
+        raise RuntimeError(
+            f"phonebook resolves to {row[0] if row else 'nothing'}, not the bench schema {schema}; "
+            "is search_path (PGOPTIONS) set?"
+        )
+
+
+# Operations
+def bench_bulk_load(conn, schema, path, on_conflict, work_dir):
+    components = ("core",) if on_conflict == "phone" else ("core", "procedures")
+    reset_schema(conn, schema, components)
+    stats = bulk_load_csv(conn, path, on_conflict, reject_path=os.path.join(work_dir, "rejects.csv"))
+    with conn.cursor() as cur:
+        cur.execute("ANALYZE phonebook")
+    conn.commit()
+    return {
+        "count": 1,
+        "seconds": stats["seconds"],
+        "rows": stats["loaded"],
+        "rejected": stats["rejected"],
+        "rows_per_sec": stats["rows_per_sec"],
+    }
+
+
+def bench_insert_many(conn, rows, samples, batch_size, seed):
+    # New contacts past the end of the loaded dataset, one batch per call
+    calls = []
+    for b in range(samples):
+        batch = [synthetic_contact(rows + b * batch_size + j, seed) for j in range(batch_size)]
+        names, phones = zip(*batch)
+        calls.append(("SELECT * FROM insert_many_users(%s, %s)", (list(names), list(phones))))
+    return summarize(timed_calls(conn, calls), rows=samples * batch_size)
+
+
+def search_patterns(rng, rows, samples, seed):
+    patterns = []
+    for _ in range(samples):
+        name, phone = synthetic_contact(rng.randrange(rows), seed)
+        kind = rng.random()
+        if kind < 0.4:
+            patterns.append(name[:rng.randint(3, 6)])
+        elif kind < 0.8:
+            patterns.append(phone[:rng.randint(4, 7)])
+        else:
+            patterns.append(name.split()[-1][1:6])
+    return patterns
+
+
+def bench_search(conn, rng, rows, samples, seed):
+    results = {}
+    patterns = search_patterns(rng, rows, samples, seed)
+    for mode in SEARCH_MODES:
+        latencies = []
+        with conn.cursor() as cur:
+            for pattern in patterns:
+                started = time.perf_counter()
+                search_phonebook(cur, pattern, mode)
+                conn.commit()
+                latencies.append(time.perf_counter() - started)
+        results[f"search_phonebook[{mode}]"] = summarize(latencies)
+        calls = [("SELECT * FROM search_phonebook(%s, %s, %s)", (pattern, mode, 50)) for pattern in patterns]
+        results[f"search_phonebook_sql[{mode}]"] = summarize(timed_calls(conn, calls))
+    return results
+
+
+def bench_paging(conn, rng, rows, samples, page_size):
+    with conn.cursor() as cur:
+        cur.execute("SELECT min(id), max(id) FROM phonebook")
+        min_id, max_id = cur.fetchone()
+    conn.commit()
+    offsets = [rng.randrange(max(1, rows - page_size)) for _ in range(samples)]
+    paged = [("SELECT * FROM get_phonebook_paged(%s, %s)", (page_size, offset)) for offset in offsets]
+    # The keyset variant 11.py pages with, for comparison at the same depths
+    after = [("SELECT * FROM get_phonebook_after(%s, %s)", (min_id - 1 + offset, page_size)) for offset in offsets]
+    return {
+        "get_phonebook_paged": summarize(timed_calls(conn, paged)),
+        "get_phonebook_after": summarize(timed_calls(conn, after)),
+    }
+
+
+def bench_delete(conn, rng, rows, samples, seed):
+    # Half by name, half by phone; every identifier is deleted once
+    calls = []
+    for k, i in enumerate(rng.sample(range(rows), min(samples, rows))):
+        name, phone = synthetic_contact(i, seed)
+        calls.append(("CALL delete_user(%s)", (name if k % 2 == 0 else phone,)))
+    return summarize(timed_calls(conn, calls))
+
+
+def run_size(rows, args):
+    path = dataset_path(args.data_dir, rows, args.seed)
+    rng = random.Random(args.seed)
+    operations = {}
+    with connection() as conn:
+        for on_conflict in ("phone", "first_name"):
+            print(f"[{rows}] bulk_load_csv ({on_conflict})")
+            operations[f"bulk_load_csv[{on_conflict}]"] = bench_bulk_load(
+                conn, args.schema, path, on_conflict, args.data_dir
+            )
+        # The first_name load leaves the 11.py schema in place for the rest
+        print(f"[{rows}] search_phonebook")
+        operations.update(bench_search(conn, rng, rows, args.samples, args.seed))
+        print(f"[{rows}] get_phonebook_paged")
+        operations.update(bench_paging(conn, rng, rows, args.samples, args.page_size))
+        print(f"[{rows}] insert_many_users")
+        operations["insert_many_users"] = bench_insert_many(
+            conn, rows, max(1, args.samples // 10), args.batch_size, args.seed
+        )
+        print(f"[{rows}] delete_user")
+        operations["delete_user"] = bench_delete(conn, rng, rows, args.samples, args.seed)
+        if not args.keep_schema:
+            with conn.cursor() as cur:
+                cur.execute(f"DROP SCHEMA IF EXISTS {args.schema} CASCADE")
+            conn.commit()
+    return {"rows": rows, "operations": operations}
+
+
+# Reporting
+def environment():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    with connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SHOW server_version")
+            server_version = cur.fetchone()[0]
+        conn.commit()
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "postgres": server_version,
+    }
+
+
+def fmt(value, spec):
+    if value is None:
+        return "-".rjust(int(spec.split(".")[0]))
+    return format(value, spec)
+
+
+def print_report(results, baseline=None):
+    previous = {}
+    if baseline:
+        for run in baseline["runs"]:
+            previous[run["rows"]] = run["operations"]
+    for run in results["runs"]:
+        print(f"\n{run['rows']} rows")
+        print(f"  {'operation':34} {'ops/s':>10} {'rows/s':>11} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for name, stats in run["operations"].items():
+            line = (f"  {name:34} {fmt(stats.get('ops_per_sec'), '10.1f')} "
+                    f"{fmt(stats.get('rows_per_sec'), '11.0f')} {fmt(stats.get('p50_ms'), '9.2f')} "
+                    f"{fmt(stats.get('p95_ms'), '9.2f')} {fmt(stats.get('p99_ms'), '9.2f')}")
+            old = previous.get(run["rows"], {}).get(name)
+            if old:
+                # Throughput ratio against the baseline run: >1 is faster
+                key = "rows_per_sec" if stats.get("rows_per_sec") else "ops_per_sec"
+                if old.get(key) and stats.get(key):
+                    line += f"  x{stats[key] / old[key]:.2f}"
+            print(line)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Benchmark the phonebook loaders and queries.")
+    parser.add_argument("--rows", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="dataset sizes to run, e.g. 10000 1000000 10000000")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES,
+                        help="calls per latency measurement")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH,
+                        help="contacts per insert_many_users call")
+    parser.add_argument("--page-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=tempfile.gettempdir(),
+                        help="where generated CSV files are cached")
+    parser.add_argument("--output", default=None,
+                        help="JSON results file (default: bench-<timestamp>.json)")
+    parser.add_argument("--baseline", default=None,
+                        help="earlier JSON results to compare throughput against")
+    parser.add_argument("--keep-schema", action="store_true",
+                        help="leave the scratch schema in place after the run")
+    args = parser.parse_args(argv)
+    args.schema = os.environ.get("PHONEBOOK_BENCH_SCHEMA", DEFAULT_SCHEMA)
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    output = args.output or f"bench-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    results = {
+        "environment": environment(),
+        "settings": {
+            "samples": args.samples,
+            "batch_size": args.batch_size,
+            "page_size": args.page_size,
+            "seed": args.seed,
+        },
+        "runs": [],
+    }
+    try:
+        for rows in sorted(args.rows):
+            results["runs"].append(run_size(rows, args))
+            # Written after every size so a long 10M run still leaves results behind
+            with open(output, "w", encoding='utf-8') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+    finally:
+        close_pool()
+    print_report(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,212 @@
+import csv
+
+from phones import phone_key
+
+# Bulk update/delete by identifier (a first_name or a phone in any format).
+# Each lookup is its own "= ANY(array)" index probe, first_name and
+# phone_norm, UNIONed, instead of "first_name = x OR phone_norm = y" per
+# identifier: one statement and one transaction for any number of them.
+# phone_norm's index is not unique, and first_name is only unique (with its
+# own btree index) once procedures v1 has run, so an identifier may match
+# several rows. Results come back per identifier, in input order; a row
+# matched by two identifiers counts for both when deleting, and goes to the
+# later entry when updating.
+#
+# The same queries back the delete_users()/update_users() SQL functions
+# that migrations.py installs; {identifiers} and friends are filled in with
+# psycopg2 parameters here and with the function arguments there.
+
+BULK_DELETE_QUERY = """
+    WITH ids AS (
+        SELECT i.identifier, i.phone_key, i.ord
+        FROM unnest({identifiers}, {phone_keys})
+            WITH ORDINALITY AS i(identifier, phone_key, ord)
+    ), targets AS (
+        SELECT p.id, p.first_name, p.phone_norm FROM phonebook p
+        WHERE p.first_name = ANY({identifiers})
+        UNION
+        SELECT p.id, p.first_name, p.phone_norm FROM phonebook p
+        WHERE p.phone_norm = ANY({phone_keys})
+    ), matches AS (
+        SELECT t.id, i.ord FROM targets t JOIN ids i ON t.first_name = i.identifier
+        UNION
+        SELECT t.id, i.ord FROM targets t JOIN ids i ON t.phone_norm = i.phone_key
+    ), removed AS (
+        DELETE FROM phonebook p
+        USING targets t
+        WHERE p.id = t.id
+        RETURNING p.id
+    )
+    SELECT i.identifier, count(r.id)
+    FROM ids i
+    LEFT JOIN (matches m JOIN removed r ON r.id = m.id) ON m.ord = i.ord
+    GROUP BY i.ord, i.identifier
+    ORDER BY i.ord
+"""
+
+BULK_UPDATE_QUERY = """
+    WITH entries AS (
+        SELECT e.identifier, e.phone_key, NULLIF(e.new_name, '') AS new_name,
+               NULLIF(e.new_phone, '') AS new_phone, e.ord
+        FROM unnest({identifiers}, {phone_keys}, {new_names}, {new_phones})
+            WITH ORDINALITY AS e(identifier, phone_key, new_name, new_phone, ord)
+    ), targets AS (
+        SELECT p.id, p.first_name, p.phone_norm FROM phonebook p
+        WHERE p.first_name = ANY({identifiers})
+        UNION
+        SELECT p.id, p.first_name, p.phone_norm FROM phonebook p
+        WHERE p.phone_norm = ANY({phone_keys})
+    ), matches AS (
+        SELECT t.id, e.ord FROM targets t JOIN entries e ON t.first_name = e.identifier
+        UNION
+        SELECT t.id, e.ord FROM targets t JOIN entries e ON t.phone_norm = e.phone_key
+    ), assigned AS (
+        -- A row matched by several entries takes the last one
+        SELECT DISTINCT ON (m.id) m.id, e.ord, e.new_name, e.new_phone
+        FROM matches m
+        JOIN entries e ON e.ord = m.ord
+        ORDER BY m.id, e.ord DESC
+    ), changed AS (
+        UPDATE phonebook p
+        SET first_name = COALESCE(a.new_name, p.first_name),
+            phone = COALESCE(a.new_phone, p.phone)
+        FROM assigned a
+        WHERE p.id = a.id
+        RETURNING a.ord
+    )
+    SELECT e.identifier, count(c.ord)
+    FROM entries e
+    LEFT JOIN changed c ON c.ord = e.ord
+    GROUP BY e.ord, e.identifier
+    ORDER BY e.ord
+"""
+
+# From the client, phone keys are worked out by phones.phone_key()
+BULK_DELETE_SQL = BULK_DELETE_QUERY.format(
+    identifiers="%(identifiers)s::text[]",
+    phone_keys="%(phone_keys)s::text[]",
+)
+
+BULK_UPDATE_SQL = BULK_UPDATE_QUERY.format(
+    identifiers="%(identifiers)s::text[]",
+    phone_keys="%(phone_keys)s::text[]",
+    new_names="%(new_names)s::text[]",
+    new_phones="%(new_phones)s::text[]",
+)
+
+# Inside the functions the phone keys are worked out in SQL, in input order.
+# Procedures v4 installed them with normalize_phone(); phone_key() (v7) also
+# keeps identifiers with letters from matching a phone, as phones.phone_key()
+FUNCTION_PHONE_KEYS = (
+    "ARRAY(SELECT {} "
+    "FROM unnest(identifiers) WITH ORDINALITY AS u(identifier, ord) ORDER BY u.ord)"
+)
+
+DELETE_USERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION delete_users(identifiers TEXT[])
+RETURNS TABLE(identifier TEXT, deleted BIGINT)
+LANGUAGE sql
+AS $$
+""" + BULK_DELETE_QUERY + """;
+$$;
+"""
+
+UPDATE_USERS_FUNCTION = """
+CREATE OR REPLACE FUNCTION update_users(
+    identifiers TEXT[],
+    new_names TEXT[],
+    new_phones TEXT[]
+)
+RETURNS TABLE(identifier TEXT, updated BIGINT)
+LANGUAGE sql
+AS $$
+""" + BULK_UPDATE_QUERY + """;
+$$;
+"""
+
+FUNCTION_ARGS = {"identifiers": "identifiers", "new_names": "new_names", "new_phones": "new_phones"}
+
+DELETE_USERS_SQL = DELETE_USERS_FUNCTION.format(
+    phone_keys=FUNCTION_PHONE_KEYS.format("NULLIF(normalize_phone(u.identifier), '')"), **FUNCTION_ARGS
+)
+UPDATE_USERS_SQL = UPDATE_USERS_FUNCTION.format(
+    phone_keys=FUNCTION_PHONE_KEYS.format("NULLIF(normalize_phone(u.identifier), '')"), **FUNCTION_ARGS
+)
+
+DELETE_USERS_PHONE_KEY_SQL = DELETE_USERS_FUNCTION.format(
+    phone_keys=FUNCTION_PHONE_KEYS.format("phone_key(u.identifier)"), **FUNCTION_ARGS
+)
+UPDATE_USERS_PHONE_KEY_SQL = UPDATE_USERS_FUNCTION.format(
+    phone_keys=FUNCTION_PHONE_KEYS.format("phone_key(u.identifier)"), **FUNCTION_ARGS
+)
+
+
+def delete_users(cur, identifiers):
+    # -> [(identifier, rows deleted)]
+    identifiers = list(identifiers)
+    if not identifiers:
+        return []
+    cur.execute(BULK_DELETE_SQL, {
+        "identifiers": identifiers,
+        "phone_keys": [phone_key(i) for i in identifiers],
+    })
+    return cur.fetchall()
+
+
+def update_users(cur, changes):
+    # changes: (identifier, new_name, new_phone); None or '' keeps the value
+    # -> [(identifier, rows updated)]
+    changes = list(changes)
+    if not changes:
+        return []
+    cur.execute(BULK_UPDATE_SQL, {
+        "identifiers": [c[0] for c in changes],
+        "phone_keys": [phone_key(c[0]) for c in changes],
+        "new_names": [c[1] for c in changes],
+        "new_phones": [c[2] for c in changes],
+    })
+    return cur.fetchall()
+
+
+def read_identifiers(file_path):
+    # One name or phone per line; blank lines are skipped
+    with open(file_path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def read_changes(file_path):
+    # "identifier,new_name,new_phone" per line; leave a field empty to keep it.
+    # -> (changes, rejects); rejects are (line, row, reason), blank lines skipped
+    changes = []
+    rejects = []
+    with open(file_path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            values = [value.strip() for value in row] + ["", "", ""]
+            identifier, new_name, new_phone = values[:3]
+            if not any(values):
+                continue
+            if not identifier:
+                rejects.append((reader.line_num, row, "no name or phone to match"))
+            elif not new_name and not new_phone:
+                rejects.append((reader.line_num, row, "no new name or phone"))
+            else:
+                changes.append((identifier, new_name or None, new_phone or None))
+    return changes, rejects
+
+
+def print_rejects(rejects, show=10):
+    for line, row, reason in rejects[:show]:
+        print(f"Skipped line {line} ({','.join(row)}): {reason}")
+    if len(rejects) > show:
+        print(f"... and {len(rejects) - show} more skipped lines")
+
+
+def print_bulk_report(results, verb, show=10):
+    total = sum(count for _, count in results)
+    missed = [identifier for identifier, count in results if count == 0]
+    print(f"{total} rows {verb} for {len(results) - len(missed)} of {len(results)} identifiers.")
+    if missed:
+        shown = ", ".join(missed[:show])
+        more = f" and {len(missed) - show} more" if len(missed) > show else ""
+        print(f"No match: {shown}{more}")
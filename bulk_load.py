@@ -0,0 +1,169 @@
+import csv
+import io
+import time
+
+from fast_csv import read_contact_batches
+
+STAGING_TABLE = "phonebook_staging"
+
+# One set-based merge per chunk, keyed by the script's ON CONFLICT target.
+# Each returns the rows it did not write, as (seq, first_name, phone, reason).
+# "phone": first row wins; later duplicates and phones already stored are rejected.
+# "first_name": last row wins; rows whose phone belongs to another name are rejected.
+MERGE_SQL = {
+    "phone": """
+        WITH ranked AS (
+            SELECT seq, first_name, phone,
+                   ROW_NUMBER() OVER (PARTITION BY phone ORDER BY seq) AS n
+            FROM {staging}
+        ), inserted AS (
+            INSERT INTO phonebook (first_name, phone)
+            SELECT first_name, phone FROM ranked WHERE n = 1
+            ON CONFLICT (phone) DO NOTHING
+            RETURNING phone
+        )
+        SELECT
+            r.seq,
+            r.first_name,
+            r.phone,
+            CASE WHEN r.n > 1 THEN 'duplicate phone in file' ELSE 'phone already in phonebook' END
+        FROM ranked r
+        WHERE r.n > 1 OR NOT EXISTS (SELECT 1 FROM inserted i WHERE i.phone = r.phone)
+        ORDER BY r.seq
+    """,
+    "first_name": """
+        WITH latest AS (
+            SELECT DISTINCT ON (first_name) seq, first_name, phone
+            FROM {staging}
+            ORDER BY first_name, seq DESC
+        ), checked AS (
+            SELECT
+                l.seq,
+                l.first_name,
+                l.phone,
+                CASE
+                    WHEN ROW_NUMBER() OVER (PARTITION BY l.phone ORDER BY l.seq) > 1
+                        THEN 'duplicate phone in file'
+                    WHEN EXISTS (
+                        SELECT 1 FROM phonebook p
+                        WHERE p.phone = l.phone AND p.first_name <> l.first_name
+                    )
+                        THEN 'phone already in phonebook'
+                END AS reason
+            FROM latest l
+        ), merged AS (
+            INSERT INTO phonebook (first_name, phone)
+            SELECT first_name, phone FROM checked WHERE reason IS NULL
+            ON CONFLICT (first_name) DO UPDATE SET phone = EXCLUDED.phone
+        )
+        SELECT seq, first_name, phone, reason
+        FROM checked
+        WHERE reason IS NOT NULL
+        ORDER BY seq
+    """,
+}
+
+
+def create_staging(cur):
+    cur.execute(f"""
+    CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} (
+        seq BIGINT,
+        first_name TEXT,
+        phone TEXT
+    ) ON COMMIT DELETE ROWS
+    """)
+
+
+def copy_chunk(cur, data):
+    # data is COPY csv bytes ("seq,first_name,phone" lines) from fast_csv
+    cur.copy_expert(
+        f"COPY {STAGING_TABLE} (seq, first_name, phone) FROM STDIN WITH (FORMAT csv)",
+        io.BytesIO(data)
+    )
+
+
+def merge_chunk(cur, on_conflict):
+    cur.execute(MERGE_SQL[on_conflict].format(staging=STAGING_TABLE))
+    return cur.fetchall() if cur.description else []
+
+
+class RejectWriter:
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def write(self, seq, row, reason):
+        if self._file is None:
+            self._file = open(self.path, "w", newline='', encoding='utf-8')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["line", "first_name", "phone", "reason"])
+        self._writer.writerow([seq, *row, reason])
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def bulk_load_csv(conn, file_path, on_conflict, chunk_size=50000, reject_path=None):
+    if on_conflict not in MERGE_SQL:
+        raise ValueError(f"Unsupported conflict target: {on_conflict}")
+    if reject_path is None:
+        reject_path = file_path + ".rejects.csv"
+
+    rejects = RejectWriter(reject_path)
+    loaded = 0
+    started = time.perf_counter()
+    cur = conn.cursor()
+    try:
+        create_staging(cur)
+        chunk = []
+        pending = 0
+
+        def flush():
+            copy_chunk(cur, b"".join(chunk))
+            rejected = merge_chunk(cur, on_conflict)
+            for seq, first_name, phone, reason in rejected:
+                rejects.write(seq, (first_name, phone), reason)
+            # Commit per chunk so a later failure keeps everything loaded so far
+            conn.commit()
+            chunk.clear()
+            return len(rejected)
+
+        for data, rows, lines, bad in read_contact_batches(file_path):
+            for seq, row, reason in bad:
+                rejects.write(seq, row, reason)
+            # chunk_size is rounded up to whole reader blocks
+            chunk.append(data)
+            pending += rows
+            loaded += rows
+            if pending >= chunk_size:
+                loaded -= flush()
+                pending = 0
+        if chunk:
+            loaded -= flush()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+        rejects.close()
+
+    elapsed = time.perf_counter() - started
+    rate = loaded / elapsed if elapsed > 0 else 0.0
+    return {
+        "loaded": loaded,
+        "rejected": rejects.count,
+        "reject_path": reject_path if rejects.count else None,
+        "seconds": elapsed,
+        "rows_per_sec": rate,
+    }
+
+
+def print_load_report(stats):
+    print(f"Loaded {stats['loaded']} rows in {stats['seconds']:.2f}s "
+          f"({stats['rows_per_sec']:.0f} rows/sec).")
+    if stats["rejected"]:
+        print(f"Rejected {stats['rejected']} rows, see {stats['reject_path']}")
@@ -0,0 +1,173 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from db import transaction
+from phones import normalize_phone, phone_key
+
+_MISSING = object()
+
+
+class TTLCache:
+    # Bounded LRU with a per-entry time-to-live, safe to share between threads.
+    # index(key, value) -> tags for the reverse index, so invalidate_tagged()
+    # can drop every entry mentioning a tag without scanning the cache.
+    def __init__(self, maxsize=10000, ttl=300.0, index=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.index = index
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()
+        self._by_tag = {}
+        self._lock = threading.Lock()
+
+    def _link(self, key, value):
+        if self.index is not None:
+            for tag in self.index(key, value):
+                self._by_tag.setdefault(tag, set()).add(key)
+
+    def _unlink(self, key, value):
+        if self.index is not None:
+            for tag in self.index(key, value):
+                keys = self._by_tag.get(tag)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._by_tag[tag]
+
+    def _drop(self, key):
+        entry = self._data.pop(key, _MISSING)
+        if entry is not _MISSING:
+            self._unlink(key, entry[0])
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+                self._drop(key)
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._drop(key)
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._link(key, value)
+            while len(self._data) > self.maxsize:
+                old_key, (old_value, _) = self._data.popitem(last=False)
+                self._unlink(old_key, old_value)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def invalidate_tagged(self, tags):
+        with self._lock:
+            for tag in tags:
+                for key in list(self._by_tag.get(tag, ())):
+                    self._drop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._by_tag.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+CACHE_SIZE = int(os.environ.get("PHONEBOOK_CACHE_SIZE", "10000"))
+CACHE_TTL = float(os.environ.get("PHONEBOOK_CACHE_TTL", "300"))
+
+# Each one is also indexed the other way round (canonical phone -> names,
+# name -> phones), so a write only drops the entries that mention it
+phones_by_name = TTLCache(   # first_name -> tuple of phones
+    CACHE_SIZE, CACHE_TTL,
+    index=lambda name, phones: {normalize_phone(p) for p in phones} - {""},
+)
+name_by_phone = TTLCache(    # canonical phone -> first_name or None
+    CACHE_SIZE, CACHE_TTL,
+    index=lambda phone, name: () if name is None else (name,),
+)
+search_results = TTLCache(1000, min(CACHE_TTL, 30.0))
+
+
+def lookup_phones(first_name):
+    hit, phones = phones_by_name.get(first_name)
+    if hit:
+        return phones
+    with transaction() as cur:
+        cur.execute("SELECT phone FROM phonebook WHERE first_name=%s ORDER BY id", (first_name,))
+        phones = tuple(row[0] for row in cur.fetchall())
+    phones_by_name.set(first_name, phones)
+    return phones
+
+
+def lookup_name(phone):
+    # Unknown numbers are cached too; caller-ID misses are as hot as hits.
+    # Keyed by the canonical number, so "8 747..." and "+7747..." share an entry.
+    key = phone_key(phone)
+    if key is None:
+        return None
+    hit, name = name_by_phone.get(key)
+    if hit:
+        return name
+    with transaction() as cur:
+        cur.execute("SELECT first_name FROM phonebook WHERE phone_norm=%s ORDER BY id LIMIT 1", (key,))
+        row = cur.fetchone()
+    name = row[0] if row else None
+    name_by_phone.set(key, name)
+    return name
+
+
+def cached_search(key, fetch):
+    hit, rows = search_results.get(key)
+    if hit:
+        return rows
+    rows = fetch()
+    search_results.set(key, rows)
+    return rows
+
+
+def invalidate_contacts(names=(), phones=()):
+    # Drop every entry that mentions one of the written names or phones,
+    # including reverse mappings the writer could not name directly. Phones
+    # are keyed like phone_norm; a name passed as a phone only over-invalidates.
+    names = set(n for n in names if n)
+    phones = set(normalize_phone(p) for p in phones if p) - {""}
+    for name in names:
+        phones_by_name.invalidate(name)
+    for phone in phones:
+        name_by_phone.invalidate(phone)
+    name_by_phone.invalidate_tagged(names)
+    phones_by_name.invalidate_tagged(phones)
+    search_results.clear()
+
+
+def invalidate_all():
+    phones_by_name.clear()
+    name_by_phone.clear()
+    search_results.clear()
+
+
+def cache_stats():
+    return {
+        "phones_by_name": phones_by_name.stats(),
+        "name_by_phone": name_by_phone.stats(),
+        "search_results": search_results.stats(),
+    }
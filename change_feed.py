@@ -0,0 +1,373 @@
+import json
+import select
+import sqlite3
+import sys
+import time
+
+import psycopg2
+
+from db import get_dsn
+from export import stream_rows
+from phones import normalize_phone, phone_key
+
+CHANNEL = "phonebook_changes"
+
+# Every committed phonebook change is announced on CHANNEL as a compact JSON
+# array: ["I"|"U"|"D", id, first_name, phone], or ["T"] for a TRUNCATE.
+# Deletes carry the old row. Updates that leave name and phone as they were
+# (no-op upserts) stay quiet. Notifications go out at commit, in commit order,
+# to every session LISTENing at that point. Statement-level triggers over
+# transition tables: one trigger call per statement instead of per row.
+CHANGE_FEED_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION phonebook_notify_change()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    BEGIN
+        IF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('I', n.id, n.first_name, n.phone)::text)
+            FROM new_rows n;
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('U', n.id, n.first_name, n.phone)::text)
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE o.first_name IS DISTINCT FROM n.first_name OR o.phone IS DISTINCT FROM n.phone;
+        ELSIF TG_OP = 'DELETE' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('D', o.id, o.first_name, o.phone)::text)
+            FROM old_rows o;
+        ELSE
+            PERFORM pg_notify('{CHANNEL}', '["T"]');
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+    # Transition tables allow one event per trigger
+    "DROP TRIGGER IF EXISTS phonebook_notify_insert ON phonebook",
+    """
+    CREATE TRIGGER phonebook_notify_insert
+    AFTER INSERT ON phonebook
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION phonebook_notify_change()
+    """,
+    "DROP TRIGGER IF EXISTS phonebook_notify_update ON phonebook",
+    """
+    CREATE TRIGGER phonebook_notify_update
+    AFTER UPDATE ON phonebook
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION phonebook_notify_change()
+    """,
+    "DROP TRIGGER IF EXISTS phonebook_notify_delete ON phonebook",
+    """
+    CREATE TRIGGER phonebook_notify_delete
+    AFTER DELETE ON phonebook
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT EXECUTE FUNCTION phonebook_notify_change()
+    """,
+    "DROP TRIGGER IF EXISTS phonebook_notify_truncate ON phonebook",
+    """
+    CREATE TRIGGER phonebook_notify_truncate
+    AFTER TRUNCATE ON phonebook
+    FOR EACH STATEMENT EXECUTE FUNCTION phonebook_notify_change()
+    """,
+]
+
+
+# A statement touching more than NOTIFY_ROW_LIMIT rows (a bulk import) sends
+# a single ["R"] instead of a payload per row, so one big transaction cannot
+# fill the NOTIFY queue, which would fail every phonebook write until
+# listeners catch up. Consumers answer "R" by copying the table again.
+# Every payload also ends with a statement sequence number, see below.
+NOTIFY_ROW_LIMIT = 10000
+
+CHANGE_FEED_RESYNC_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION phonebook_notify_change()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $$
+    DECLARE
+        changed BIGINT;
+        seq BIGINT;
+    BEGIN
+        -- Postgres delivers identical payloads from one transaction only once,
+        -- so A->B->A->B would lose its last update; a per-transaction statement
+        -- counter at the end of every payload keeps them all distinct
+        seq := COALESCE(NULLIF(current_setting('phonebook.notify_seq', true), ''), '0')::BIGINT + 1;
+        PERFORM set_config('phonebook.notify_seq', seq::text, true);
+        IF TG_OP = 'TRUNCATE' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('T', seq)::text);
+            RETURN NULL;
+        ELSIF TG_OP = 'DELETE' THEN
+            SELECT count(*) INTO changed FROM (SELECT 1 FROM old_rows LIMIT {NOTIFY_ROW_LIMIT + 1}) AS r;
+        ELSE
+            SELECT count(*) INTO changed FROM (SELECT 1 FROM new_rows LIMIT {NOTIFY_ROW_LIMIT + 1}) AS r;
+        END IF;
+        IF changed > {NOTIFY_ROW_LIMIT} THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('R', seq)::text);
+        ELSIF TG_OP = 'INSERT' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('I', n.id, n.first_name, n.phone, seq)::text)
+            FROM new_rows n;
+        ELSIF TG_OP = 'UPDATE' THEN
+            PERFORM pg_notify('{CHANNEL}', json_build_array('U', n.id, n.first_name, n.phone, seq)::text)
+            FROM new_rows n
+            JOIN old_rows o ON o.id = n.id
+            WHERE o.first_name IS DISTINCT FROM n.first_name OR o.phone IS DISTINCT FROM n.phone;
+        ELSE
+            PERFORM pg_notify('{CHANNEL}', json_build_array('D', o.id, o.first_name, o.phone, seq)::text)
+            FROM old_rows o;
+        END IF;
+        RETURN NULL;
+    END;
+    $$;
+    """,
+]
+
+
+def parse_change(payload):
+    # -> (op, id, first_name, phone); TRUNCATE and resync have no row. The
+    # trailing sequence number only keeps payloads unique and is dropped.
+    change = json.loads(payload)
+    if change[0] in ("T", "R"):
+        return change[0], None, None, None
+    return tuple(change[:4])
+
+
+class DictMirror:
+    # In-memory copy of phonebook with the two lookups the edge nodes serve
+    def __init__(self):
+        self.rows = {}        # id -> (first_name, phone)
+        self.by_name = {}     # first_name -> set of ids
+        self.by_phone = {}    # canonical phone -> set of ids
+
+    def __len__(self):
+        return len(self.rows)
+
+    def clear(self):
+        self.rows.clear()
+        self.by_name.clear()
+        self.by_phone.clear()
+
+    def load(self, rows):
+        for row_id, name, phone in rows:
+            self._put(row_id, name, phone)
+
+    def replace(self, rows):
+        # Built on the side, so lookups keep answering from the old copy
+        fresh = DictMirror()
+        fresh.load(rows)
+        self.rows, self.by_name, self.by_phone = fresh.rows, fresh.by_name, fresh.by_phone
+
+    def apply(self, changes):
+        for op, row_id, name, phone in changes:
+            if op == "T":
+                self.clear()
+            elif op == "D":
+                self._remove(row_id)
+            else:
+                self._put(row_id, name, phone)
+
+    def _put(self, row_id, name, phone):
+        self._remove(row_id)
+        self.rows[row_id] = (name, phone)
+        self.by_name.setdefault(name, set()).add(row_id)
+        self.by_phone.setdefault(normalize_phone(phone) or None, set()).add(row_id)
+
+    def _remove(self, row_id):
+        row = self.rows.pop(row_id, None)
+        if row is None:
+            return
+        name, phone = row
+        for index, key in ((self.by_name, name), (self.by_phone, normalize_phone(phone) or None)):
+            ids = index.get(key)
+            if ids is not None:
+                ids.discard(row_id)
+                if not ids:
+                    del index[key]
+
+    def lookup_name(self, phone):
+        # Stored rows are keyed like phone_norm; a name-like lookup matches none
+        key = phone_key(phone)
+        ids = self.by_phone.get(key) if key is not None else None
+        row = self.rows.get(min(ids)) if ids else None
+        return row[0] if row else None
+
+    def lookup_phones(self, first_name):
+        rows = self.rows
+        return tuple(rows[row_id][1] for row_id in sorted(self.by_name.get(first_name, ())) if row_id in rows)
+
+
+class SqliteMirror:
+    # The same mirror on disk, so a restarted edge node has data right away
+    # (it still resyncs: changes made while it was down were never delivered)
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS phonebook (
+                id INTEGER PRIMARY KEY,
+                first_name TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                phone_norm TEXT
+            );
+            CREATE INDEX IF NOT EXISTS phonebook_first_name_idx ON phonebook (first_name);
+            CREATE INDEX IF NOT EXISTS phonebook_phone_norm_idx ON phonebook (phone_norm);
+        """)
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM phonebook").fetchone()[0]
+
+    def clear(self):
+        with self.db:
+            self.db.execute("DELETE FROM phonebook")
+
+    def load(self, rows):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO phonebook VALUES (?, ?, ?, ?)",
+                ((row_id, name, phone, normalize_phone(phone) or None) for row_id, name, phone in rows)
+            )
+
+    def replace(self, rows):
+        # One SQLite transaction: readers see the old copy until it commits
+        with self.db:
+            self.db.execute("DELETE FROM phonebook")
+            self.db.executemany(
+                "INSERT INTO phonebook VALUES (?, ?, ?, ?)",
+                ((row_id, name, phone, normalize_phone(phone) or None) for row_id, name, phone in rows)
+            )
+
+    def apply(self, changes):
+        # One SQLite transaction per batch of notifications
+        with self.db:
+            for op, row_id, name, phone in changes:
+                if op == "T":
+                    self.db.execute("DELETE FROM phonebook")
+                elif op == "D":
+                    self.db.execute("DELETE FROM phonebook WHERE id = ?", (row_id,))
+                else:
+                    self.db.execute(
+                        "INSERT OR REPLACE INTO phonebook VALUES (?, ?, ?, ?)",
+                        (row_id, name, phone, normalize_phone(phone) or None)
+                    )
+
+    def lookup_name(self, phone):
+        row = self.db.execute(
+            "SELECT first_name FROM phonebook WHERE phone_norm = ? ORDER BY id LIMIT 1", (phone_key(phone),)
+        ).fetchone()
+        return row[0] if row else None
+
+    def lookup_phones(self, first_name):
+        rows = self.db.execute("SELECT phone FROM phonebook WHERE first_name = ? ORDER BY id", (first_name,))
+        return tuple(row[0] for row in rows)
+
+    def close(self):
+        self.db.close()
+
+
+class ChangeFeed:
+    # Keeps a mirror in step with phonebook: LISTEN first, then copy the table,
+    # then apply notifications as they arrive. Changes committed while the
+    # copy runs are delivered after it and re-applied; they carry whole rows,
+    # so that is harmless. A dropped connection means missed notifications,
+    # so reconnecting starts over with a fresh copy.
+    def __init__(self, mirror, dsn=None, channel=CHANNEL):
+        self.mirror = mirror
+        self.dsn = dsn or get_dsn()
+        self.channel = channel
+        self.conn = None
+        self.applied = 0
+        self.batches = 0
+        self.resyncs = 0
+
+    def connect(self):
+        self.close()
+        # Its own connection, not a pooled one: LISTEN is session state
+        self.conn = psycopg2.connect(self.dsn)
+        with self.conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel}")
+        self.conn.commit()
+        self._snapshot()
+        # Anything that arrived during the copy
+        self._drain()
+
+    def _snapshot(self):
+        # Named cursors need a transaction; stream_rows commits at the end.
+        # The mirror swaps the copy in whole, so lookups never see it empty.
+        self.conn.autocommit = False
+        self.mirror.replace(stream_rows(
+            self.conn, "SELECT id, first_name, phone FROM phonebook", name="change_feed_snapshot"
+        ))
+        self.conn.autocommit = True
+        self.resyncs += 1
+
+    def _drain(self):
+        applied = 0
+        notifies = self.conn.notifies
+        while notifies:
+            changes = [parse_change(n.payload) for n in notifies if n.channel == self.channel]
+            del notifies[:]
+            # After a resync marker the table is copied again; that copy covers
+            # everything before the last marker, and the changes after it are
+            # whole rows, safe to re-apply. The copy itself may queue more.
+            resync = max((i for i, change in enumerate(changes) if change[0] == "R"), default=None)
+            if resync is not None:
+                self._snapshot()
+                changes = changes[resync + 1:]
+            self.mirror.apply(changes)
+            applied += len(changes)
+            self.batches += 1
+        self.applied += applied
+        return applied
+
+    def poll(self, timeout=1.0):
+        # Waits up to timeout for notifications; returns how many were applied
+        if self.conn is None:
+            self.connect()
+        if not self.conn.notifies:
+            if select.select([self.conn], [], [], timeout) == ([], [], []):
+                return 0
+            self.conn.poll()
+        return self._drain()
+
+    def run(self, duration=None, on_batch=None, retry_seconds=5.0):
+        deadline = time.monotonic() + duration if duration is not None else None
+        while deadline is None or time.monotonic() < deadline:
+            try:
+                applied = self.poll(timeout=1.0)
+            except psycopg2.OperationalError as e:
+                print("Change feed connection lost:", e)
+                self.close()
+                time.sleep(retry_seconds)
+                continue
+            if applied and on_batch:
+                on_batch(applied)
+
+    def stats(self):
+        return {
+            "rows": len(self.mirror),
+            "applied": self.applied,
+            "batches": self.batches,
+            "resyncs": self.resyncs,
+        }
+
+    def close(self):
+        if self.conn is not None:
+            if not self.conn.closed:
+                self.conn.close()
+            self.conn = None
+
+
+if __name__ == "__main__":
+    # Tail phonebook into a local mirror: python change_feed.py [mirror.sqlite]
+    mirror = SqliteMirror(sys.argv[1]) if len(sys.argv) > 1 else DictMirror()
+    feed = ChangeFeed(mirror)
+    try:
+        feed.connect()
+        print(f"Mirrored {len(mirror)} rows; listening on {CHANNEL} (Ctrl+C to stop)")
+        feed.run(on_batch=lambda applied: print(f"Applied {applied} changes, {len(mirror)} rows"))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        feed.close()
+        print(feed.stats())
@@ -0,0 +1,94 @@
+import os
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import pool
+from psycopg2.extensions import make_dsn
+
+import query_stats
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def connect_params():
+    # The usual libpq PG* variables, with the lab defaults
+    return {
+        "host": os.environ.get("PGHOST", "localhost"),
+        "dbname": os.environ.get("PGDATABASE", "postgres"),
+        "user": os.environ.get("PGUSER", "postgres"),
+        "password": os.environ.get("PGPASSWORD", "Post9992k"),
+    }
+
+
+def get_dsn():
+    return os.environ.get("PHONEBOOK_DSN") or make_dsn(**connect_params())
+
+
+class BlockingConnectionPool(pool.ThreadedConnectionPool):
+    # ThreadedConnectionPool raises PoolError once maxconn connections are
+    # out; here the extra threads wait for one to be put back instead
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(int(maxconn))
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+def get_pool():
+    # Nothing connects until the first query asks for a connection
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = BlockingConnectionPool(
+                    int(os.environ.get("PHONEBOOK_POOL_MIN", "1")),
+                    int(os.environ.get("PHONEBOOK_POOL_MAX", "10")),
+                    get_dsn(),
+                    # Per-statement timings for query_stats; PHONEBOOK_QUERY_STATS=0 turns it off
+                    cursor_factory=query_stats.InstrumentedCursor if query_stats.ENABLED else None
+                )
+    return _pool
+
+
+@contextmanager
+def connection():
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    try:
+        yield conn
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        db_pool.putconn(conn, close=bool(conn.closed))
+
+
+@contextmanager
+def transaction():
+    # Cursor on a pooled connection; commits on success, rolls back on error
+    with connection() as conn:
+        with conn.cursor() as cur:
+            yield cur
+        conn.commit()
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
@@ -0,0 +1,43 @@
+import csv
+import json
+
+DEFAULT_ITERSIZE = 2000
+EXPORT_FORMATS = ("csv", "jsonl")
+
+
+def stream_rows(conn, sql, params=None, itersize=DEFAULT_ITERSIZE, name="phonebook_stream"):
+    # A named cursor keeps the result set on the server and fetches it
+    # itersize rows at a time, so client memory stays flat for any table size.
+    cur = conn.cursor(name=name)
+    cur.itersize = itersize
+    try:
+        cur.execute(sql, params)
+        for row in cur:
+            yield row
+    finally:
+        cur.close()
+        # Named cursors only live inside a transaction; end the read-only one
+        conn.commit()
+
+
+def write_rows(rows, path, columns, fmt="csv"):
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    count = 0
+    with open(path, "w", newline='', encoding='utf-8') as f:
+        if fmt == "csv":
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for row in rows:
+                writer.writerow(row)
+                count += 1
+        else:
+            for row in rows:
+                f.write(json.dumps(dict(zip(columns, row)), ensure_ascii=False, default=str))
+                f.write("\n")
+                count += 1
+    return count
+
+
+def export_query(conn, sql, path, columns, fmt="csv", params=None, itersize=DEFAULT_ITERSIZE):
+    return write_rows(stream_rows(conn, sql, params, itersize), path, columns, fmt)
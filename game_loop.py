@@ -0,0 +1,107 @@
+import time
+from collections import deque
+
+from snake_engine import OPPOSITE
+
+STATS_WINDOW = 240
+
+
+class InputQueue:
+    # Direction presses buffered between ticks, one consumed per tick, so two
+    # quick turns inside one slow tick both happen instead of the second
+    # overwriting the first. Repeats and reversals of the heading they will
+    # apply to are dropped on the way in.
+    def __init__(self, size=3):
+        self.size = size
+        self.pending = deque()
+
+    def push(self, action, heading):
+        last = self.pending[-1] if self.pending else heading
+        if action == last or action == OPPOSITE[last] or len(self.pending) >= self.size:
+            return False
+        self.pending.append(action)
+        return True
+
+    def pop(self):
+        return self.pending.popleft() if self.pending else None
+
+    def clear(self):
+        self.pending.clear()
+
+
+class FixedStepLoop:
+    # Accumulator-based scheduler: frame() is called once per rendered frame
+    # and says how many fixed simulation ticks are due at tick_rate; alpha is
+    # how far the next tick is, for interpolating the drawn state. A stall
+    # runs at most max_ticks_per_frame catch-up ticks and drops the rest.
+    def __init__(self, tick_rate, max_ticks_per_frame=5, timer=time.perf_counter):
+        self.tick_rate = tick_rate
+        self.max_ticks_per_frame = max_ticks_per_frame
+        self.timer = timer
+        self.accumulator = 0.0
+        self.last = None
+        self.frames = 0
+        self.ticks = 0
+        self.dropped = 0
+        self.started = None
+        self.frame_times = deque(maxlen=STATS_WINDOW)
+        self.tick_times = deque(maxlen=STATS_WINDOW)
+
+    def frame(self):
+        now = self.timer()
+        if self.last is None:
+            self.last = self.started = now
+            return 0
+        elapsed = now - self.last
+        self.last = now
+        self.frames += 1
+        self.frame_times.append(elapsed)
+        step = 1.0 / self.tick_rate
+        self.accumulator += elapsed
+        due = int(self.accumulator // step)
+        if due > self.max_ticks_per_frame:
+            self.dropped += due - self.max_ticks_per_frame
+            due = self.max_ticks_per_frame
+            self.accumulator %= step
+        else:
+            self.accumulator -= due * step
+        return due
+
+    @property
+    def alpha(self):
+        return min(1.0, self.accumulator * self.tick_rate)
+
+    def record_tick(self, seconds):
+        self.ticks += 1
+        self.tick_times.append(seconds)
+
+    def stats(self):
+        frames = list(self.frame_times)
+        ticks = list(self.tick_times)
+        running = (self.last - self.started) if self.started is not None else 0.0
+        return {
+            "fps": len(frames) / sum(frames) if frames and sum(frames) > 0 else 0.0,
+            "frame_ms_avg": sum(frames) / len(frames) * 1000 if frames else 0.0,
+            "frame_ms_max": max(frames) * 1000 if frames else 0.0,
+            "tick_ms_avg": sum(ticks) / len(ticks) * 1000 if ticks else 0.0,
+            "tick_ms_max": max(ticks) * 1000 if ticks else 0.0,
+            "ticks_per_sec": self.ticks / running if running > 0 else 0.0,
+            "tick_rate": self.tick_rate,
+            "dropped_ticks": self.dropped,
+        }
+
+
+def interpolate(previous, current, alpha):
+    # Each segment slides from where it was last tick to where it is now; a
+    # segment added by eating has no previous cell and stays put
+    if not previous or alpha >= 1.0:
+        return list(current)
+    last = len(previous)
+    positions = []
+    for i, (cx, cy) in enumerate(current):
+        if i < last:
+            px, py = previous[i]
+            positions.append((px + (cx - px) * alpha, py + (cy - py) * alpha))
+        else:
+            positions.append((cx, cy))
+    return positions
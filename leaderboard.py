@@ -0,0 +1,128 @@
+import threading
+from bisect import insort
+from datetime import datetime
+
+from db import transaction
+
+TOP_N = 10
+
+WINDOWS = {
+    "today": "date_trunc('day', NOW())",
+    "week": "NOW() - INTERVAL '7 days'",
+}
+
+
+class TopBoard:
+    # The best N leaderboard rows kept sorted in memory. Rows are one per
+    # username and scores only go up, so anything below the current N-th
+    # place can be ignored.
+    def __init__(self, size=TOP_N):
+        self.size = size
+        self.rows = []      # (-score, username, level, created_at), best first
+        self.by_user = {}   # username -> row in self.rows
+        self._lock = threading.Lock()
+
+    def load(self, rows):
+        with self._lock:
+            self.rows = []
+            self.by_user = {}
+            for username, score, level, created_at in rows:
+                self._insert(username, score, level, created_at)
+
+    def _insert(self, username, score, level, created_at):
+        row = (-score, username, level, created_at)
+        insort(self.rows, row)
+        self.by_user[username] = row
+        if len(self.rows) > self.size:
+            dropped = self.rows.pop()
+            del self.by_user[dropped[1]]
+
+    def record(self, username, score, level, created_at=None):
+        with self._lock:
+            current = self.by_user.get(username)
+            if current is not None:
+                if score <= -current[0]:
+                    return False
+                self.rows.remove(current)
+                del self.by_user[username]
+            elif len(self.rows) >= self.size and score <= -self.rows[-1][0]:
+                return False
+            self._insert(username, score, level, created_at or datetime.now())
+            return True
+
+    def top(self, limit=None):
+        with self._lock:
+            rows = self.rows[:limit]
+        return [(username, -neg_score, level, created_at) for neg_score, username, level, created_at in rows]
+
+
+_board = None
+_board_lock = threading.Lock()
+
+
+def get_top_board():
+    # Warmed from the database once; after that only record() changes it
+    global _board
+    if _board is None:
+        with _board_lock:
+            if _board is None:
+                board = TopBoard()
+                with transaction() as cur:
+                    cur.execute("""
+                        SELECT username, score, level, created_at
+                        FROM leaderboard
+                        ORDER BY score DESC
+                        LIMIT %s
+                    """, (board.size,))
+                    board.load(cur.fetchall())
+                _board = board
+    return _board
+
+
+# Best game per user among the saves that match the filter (a level, a
+# window or both). leaderboard only holds each user's all-time best, with
+# that run's level and the time it was set, so a good level-2 run by someone
+# whose record is on level 3, or a run today under an older record, would
+# never show up there.
+FILTERED_BOARD_SQL = """
+    SELECT u.username, s.score, s.level, s.created_at
+    FROM (
+        SELECT DISTINCT ON (user_id) user_id, score, level, created_at
+        FROM user_score
+        WHERE {where}
+        ORDER BY user_id, score DESC, id
+    ) s
+    JOIN users u ON u.id = s.user_id
+    ORDER BY s.score DESC, u.username
+    LIMIT %s
+"""
+
+
+def query_leaderboard(level=None, window=None, limit=TOP_N):
+    # All-time top N is served from memory (or the leaderboard score index
+    # past N); level and today/week boards come from user_score's level and
+    # created_at indexes
+    if window is not None and window not in WINDOWS:
+        raise ValueError(f"Unknown window: {window}")
+    if level is None and window is None:
+        if limit <= TOP_N:
+            return get_top_board().top(limit)
+        with transaction() as cur:
+            cur.execute("""
+                SELECT username, score, level, created_at
+                FROM leaderboard
+                ORDER BY score DESC
+                LIMIT %s
+            """, (limit,))
+            return cur.fetchall()
+    conditions = []
+    params = []
+    if level is not None:
+        conditions.append("level = %s")
+        params.append(level)
+    if window is not None:
+        conditions.append(f"created_at >= {WINDOWS[window]}")
+    params.append(limit)
+    with transaction() as cur:
+        cur.execute(FILTERED_BOARD_SQL.format(where=" AND ".join(conditions)), params)
+        return cur.fetchall()
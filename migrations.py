@@ -0,0 +1,448 @@
+from psycopg2 import errors
+
+from search import SEARCH_INDEXES_SQL
+from phones import PHONE_NORM_SQL, PHONE_KEY_SQL
+from replay import GAME_REPLAY_SQL
+from change_feed import CHANGE_FEED_SQL, CHANGE_FEED_RESYNC_SQL
+from bulk_edit import (
+    DELETE_USERS_SQL, UPDATE_USERS_SQL, DELETE_USERS_PHONE_KEY_SQL, UPDATE_USERS_PHONE_KEY_SQL
+)
+
+MIGRATION_LOCK_ID = 72010
+
+SCHEMA_VERSION_SQL = """
+CREATE TABLE IF NOT EXISTS schema_version (
+    component VARCHAR(50) PRIMARY KEY,
+    version INTEGER NOT NULL,
+    applied_at TIMESTAMP DEFAULT NOW()
+)
+"""
+
+# Tables shared by phonebook.py and 11.py
+CORE_TABLES_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS phonebook (
+        id SERIAL PRIMARY KEY,
+        first_name VARCHAR(50) NOT NULL,
+        phone VARCHAR(20) NOT NULL UNIQUE
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(50) UNIQUE NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS user_score (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        score INTEGER DEFAULT 0,
+        level INTEGER DEFAULT 1
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS leaderboard (
+        id SERIAL PRIMARY KEY,
+        username VARCHAR(50),
+        score INTEGER,
+        level INTEGER,
+        created_at TIMESTAMP DEFAULT NOW()
+    )
+    """,
+]
+
+# 11.py upserts ON CONFLICT (first_name). Tables created by the old DROP/CREATE
+# start-up already carry this as the phonebook_first_name_key constraint.
+# phonebook.py allows repeated names, and same-name contacts with different
+# phones are real data, so duplicates are reported for a person to resolve
+# rather than deleted.
+FIRST_NAME_UNIQUE_SQL = [
+    """
+    DO $$
+    DECLARE
+        total INTEGER;
+        names TEXT;
+    BEGIN
+        SELECT count(*) INTO total
+        FROM (SELECT 1 FROM phonebook GROUP BY first_name HAVING count(*) > 1) AS dupes;
+        IF total > 0 THEN
+            SELECT string_agg(format('%s (%s rows)', first_name, n), ', ' ORDER BY first_name)
+            INTO names
+            FROM (
+                SELECT first_name, count(*) AS n
+                FROM phonebook
+                GROUP BY first_name
+                HAVING count(*) > 1
+                ORDER BY first_name
+                LIMIT 20
+            ) AS dupes;
+            RAISE EXCEPTION '% repeated first_name values in phonebook; 11.py needs them unique. Rename or delete them and start again: %',
+                total, names;
+        END IF;
+    END;
+    $$
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS phonebook_first_name_key ON phonebook (first_name)",
+]
+
+# One row per username so progress saves can upsert atomically
+LEADERBOARD_USERNAME_UNIQUE_SQL = [
+    """
+    DELETE FROM leaderboard a
+    USING leaderboard b
+    WHERE a.username = b.username
+      AND (a.score < b.score OR (a.score = b.score AND a.id < b.id))
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS leaderboard_username_key ON leaderboard (username)",
+]
+
+LEADERBOARD_INDEXES_SQL = [
+    "CREATE INDEX IF NOT EXISTS leaderboard_score_idx ON leaderboard (score DESC)",
+    "CREATE INDEX IF NOT EXISTS leaderboard_level_score_idx ON leaderboard (level, score DESC)",
+    "CREATE INDEX IF NOT EXISTS leaderboard_created_at_idx ON leaderboard (created_at)",
+]
+
+# Latest user_score row per user, for DISTINCT ON (user_id) ... ORDER BY user_id, id DESC
+USER_SCORE_INDEX_SQL = [
+    "CREATE INDEX IF NOT EXISTS user_score_user_id_idx ON user_score (user_id, id DESC)",
+]
+
+# When each save happened, for the today/week leaderboards, and the level
+# index for per-level boards. Rows saved before this step have a NULL
+# created_at and so fall outside every window.
+USER_SCORE_BOARD_SQL = [
+    "ALTER TABLE user_score ADD COLUMN IF NOT EXISTS created_at TIMESTAMP",
+    "ALTER TABLE user_score ALTER COLUMN created_at SET DEFAULT NOW()",
+    "CREATE INDEX IF NOT EXISTS user_score_created_at_idx ON user_score (created_at)",
+    "CREATE INDEX IF NOT EXISTS user_score_level_idx ON user_score (level)",
+]
+
+DROP_LEGACY_ROUTINES_SQL = [
+    "DROP FUNCTION IF EXISTS search_phonebook(TEXT)",
+    "DROP FUNCTION IF EXISTS get_all_phonebook_ordered()",
+    "DROP PROCEDURE IF EXISTS insert_many_users(TEXT[], TEXT[])",
+]
+
+# Every branch is answered by the pg_trgm indexes from search.py or the
+# phone_norm index (phones.py); core always migrates first, so phone_norm
+# exists. An 8-prefixed pattern also tries its 7... canonical form.
+SEARCH_PHONEBOOK_SQL = """
+CREATE OR REPLACE FUNCTION search_phonebook(
+    pattern TEXT,
+    mode TEXT DEFAULT 'substring',
+    p_limit INT DEFAULT 50
+)
+RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    escaped TEXT := replace(replace(replace(pattern, '\\', '\\\\'), '%', '\\%'), '_', '\\_');
+    digits TEXT := regexp_replace(pattern, '[^0-9]', '', 'g');
+    alt_digits TEXT := CASE
+        WHEN regexp_replace(pattern, '[^0-9]', '', 'g') ~ '^8[0-9]{0,10}$'
+            THEN '7' || substr(regexp_replace(pattern, '[^0-9]', '', 'g'), 2)
+    END;
+BEGIN
+    IF mode = 'prefix' THEN
+        RETURN QUERY
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY phonebook.id),
+            phonebook.first_name,
+            phonebook.phone
+        FROM phonebook
+        WHERE phonebook.first_name ILIKE escaped || '%'
+           OR (digits <> ''
+               AND phonebook.phone_norm ~>=~ digits
+               AND phonebook.phone_norm ~<~ (digits || ':'))
+           OR (alt_digits IS NOT NULL
+               AND phonebook.phone_norm ~>=~ alt_digits
+               AND phonebook.phone_norm ~<~ (alt_digits || ':'))
+        ORDER BY phonebook.id
+        LIMIT p_limit;
+    ELSIF mode = 'substring' THEN
+        RETURN QUERY
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY phonebook.id),
+            phonebook.first_name,
+            phonebook.phone
+        FROM phonebook
+        WHERE phonebook.first_name ILIKE '%' || escaped || '%'
+           OR phonebook.phone ILIKE '%' || escaped || '%'
+        ORDER BY phonebook.id
+        LIMIT p_limit;
+    ELSIF mode = 'fuzzy' THEN
+        RETURN QUERY
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY GREATEST(similarity(phonebook.first_name, pattern),
+                                                 similarity(phonebook.phone, pattern)) DESC,
+                                        phonebook.id),
+            phonebook.first_name,
+            phonebook.phone
+        FROM phonebook
+        WHERE phonebook.first_name % pattern
+           OR phonebook.phone % pattern
+        ORDER BY 1
+        LIMIT p_limit;
+    ELSE
+        RAISE EXCEPTION 'Unknown search mode: %', mode;
+    END IF;
+END;
+$$;
+"""
+
+GET_PHONEBOOK_PAGED_SQL = """
+CREATE OR REPLACE FUNCTION get_phonebook_paged(p_limit INT, p_offset INT)
+RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        sub.row_number,
+        sub.first_name,
+        sub.phone
+    FROM (
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY phonebook.id) AS row_number,
+            phonebook.first_name,
+            phonebook.phone
+        FROM phonebook
+    ) AS sub
+    ORDER BY sub.row_number
+    LIMIT p_limit
+    OFFSET p_offset;
+END;
+$$;
+"""
+
+# Keyset pagination: seeks on the primary key instead of counting past an OFFSET
+GET_PHONEBOOK_AFTER_SQL = """
+CREATE OR REPLACE FUNCTION get_phonebook_after(p_after_id INT, p_limit INT)
+RETURNS TABLE(id INT, first_name VARCHAR, phone VARCHAR)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT phonebook.id, phonebook.first_name, phonebook.phone
+    FROM phonebook
+    WHERE phonebook.id > p_after_id
+    ORDER BY phonebook.id
+    LIMIT p_limit;
+$$;
+"""
+
+# Plain SQL so the planner can inline it and stream rows to a server-side cursor
+GET_ALL_PHONEBOOK_ORDERED_SQL = """
+CREATE OR REPLACE FUNCTION get_all_phonebook_ordered()
+RETURNS TABLE(row_number BIGINT, first_name VARCHAR, phone VARCHAR)
+LANGUAGE sql
+STABLE
+AS $$
+    SELECT
+        ROW_NUMBER() OVER (ORDER BY phonebook.id),
+        phonebook.first_name,
+        phonebook.phone
+    FROM phonebook
+    ORDER BY phonebook.id;
+$$;
+"""
+
+UPSERT_PHONEBOOK_USER_SQL = """
+CREATE OR REPLACE PROCEDURE upsert_phonebook_user(p_name VARCHAR, p_phone VARCHAR)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO phonebook (first_name, phone)
+    VALUES (p_name, p_phone)
+    ON CONFLICT (first_name)
+    DO UPDATE SET phone = EXCLUDED.phone;
+END;
+$$;
+"""
+
+INSERT_MANY_USERS_SQL = """
+CREATE OR REPLACE FUNCTION insert_many_users(
+    names TEXT[],
+    phones TEXT[]
+)
+RETURNS TABLE(name TEXT, phone TEXT, reason TEXT)
+LANGUAGE sql
+AS $$
+    WITH entries AS (
+        SELECT u.name, u.phone, u.ord
+        FROM unnest(names, phones) WITH ORDINALITY AS u(name, phone, ord)
+    ), valid AS (
+        SELECT
+            i.*,
+            CASE
+                WHEN i.name IS NULL OR i.name = '' THEN 'Missing name'
+                WHEN i.phone IS NULL OR i.phone !~ '^[0-9\\-\\+]+$' THEN 'Invalid phone format'
+                WHEN length(i.name) > 50 THEN 'Name too long'
+                WHEN length(i.phone) > 20 THEN 'Phone too long'
+            END AS reason
+        FROM entries i
+    ), latest AS (
+        -- A later entry for the same name replaces an earlier one, as the row loop did
+        SELECT DISTINCT ON (v.name) v.name, v.phone, v.ord
+        FROM valid v
+        WHERE v.reason IS NULL
+        ORDER BY v.name, v.ord DESC
+    ), checked AS (
+        SELECT
+            l.*,
+            CASE
+                WHEN ROW_NUMBER() OVER (PARTITION BY l.phone ORDER BY l.ord) > 1
+                    THEN 'Duplicate phone in batch'
+                WHEN EXISTS (
+                    SELECT 1 FROM phonebook p
+                    WHERE p.phone = l.phone AND p.first_name <> l.name
+                )
+                    THEN 'Phone already in use'
+            END AS reason
+        FROM latest l
+    ), upserted AS (
+        INSERT INTO phonebook (first_name, phone)
+        SELECT c.name, c.phone FROM checked c WHERE c.reason IS NULL
+        ON CONFLICT (first_name)
+        DO UPDATE SET phone = EXCLUDED.phone
+    )
+    SELECT r.name, r.phone, r.reason
+    FROM (
+        SELECT v.name, v.phone, v.reason, v.ord FROM valid v WHERE v.reason IS NOT NULL
+        UNION ALL
+        SELECT c.name, c.phone, c.reason, c.ord FROM checked c WHERE c.reason IS NOT NULL
+    ) AS r
+    ORDER BY r.ord;
+$$;
+"""
+
+DELETE_USER_SQL = """
+CREATE OR REPLACE PROCEDURE delete_user(p_identifier TEXT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM phonebook
+    WHERE first_name = p_identifier
+       OR phone = p_identifier;
+END;
+$$;
+"""
+
+# Exact phone matches go through phone_norm (phones.py)
+DELETE_USER_NORM_SQL = """
+CREATE OR REPLACE PROCEDURE delete_user(p_identifier TEXT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM phonebook
+    WHERE first_name = p_identifier
+       OR phone_norm = NULLIF(normalize_phone(p_identifier), '');
+END;
+$$;
+"""
+
+# Identifiers with letters ("Room 101") no longer match phone_norm
+DELETE_USER_PHONE_KEY_SQL = """
+CREATE OR REPLACE PROCEDURE delete_user(p_identifier TEXT)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    DELETE FROM phonebook
+    WHERE first_name = p_identifier
+       OR phone_norm = phone_key(p_identifier);
+END;
+$$;
+"""
+
+# Ordered, append-only steps per component. Never edit a released step;
+# add a new version instead so existing databases pick up the change.
+MIGRATIONS = {
+    "core": [
+        (1, "phonebook, users, user_score and leaderboard tables", CORE_TABLES_SQL),
+        (2, "phonebook search indexes", SEARCH_INDEXES_SQL),
+        (3, "unique username on leaderboard", LEADERBOARD_USERNAME_UNIQUE_SQL),
+        (4, "leaderboard score, level and created_at indexes", LEADERBOARD_INDEXES_SQL),
+        (5, "user_score (user_id, id) index", USER_SCORE_INDEX_SQL),
+        (6, "normalized phone_norm column and index", PHONE_NORM_SQL),
+        (7, "game_replay table", GAME_REPLAY_SQL),
+        (8, "phone_key() identifier matching", [PHONE_KEY_SQL]),
+        (9, "user_score created_at column, created_at and level indexes", USER_SCORE_BOARD_SQL),
+    ],
+    "procedures": [
+        (1, "unique first_name on phonebook", FIRST_NAME_UNIQUE_SQL),
+        (2, "phonebook functions and procedures", DROP_LEGACY_ROUTINES_SQL + [
+            SEARCH_PHONEBOOK_SQL,
+            GET_PHONEBOOK_PAGED_SQL,
+            GET_PHONEBOOK_AFTER_SQL,
+            GET_ALL_PHONEBOOK_ORDERED_SQL,
+            UPSERT_PHONEBOOK_USER_SQL,
+            INSERT_MANY_USERS_SQL,
+            DELETE_USER_SQL,
+        ]),
+        (3, "phone_norm lookups in delete_user", [
+            DELETE_USER_NORM_SQL,
+        ]),
+        (4, "bulk delete_users and update_users functions", [
+            DELETE_USERS_SQL,
+            UPDATE_USERS_SQL,
+        ]),
+        (5, "phonebook change notification triggers", CHANGE_FEED_SQL),
+        (6, "resync notification for bulk phonebook changes", CHANGE_FEED_RESYNC_SQL),
+        (7, "phone_key() lookups in delete_user, delete_users and update_users", [
+            DELETE_USER_PHONE_KEY_SQL,
+            DELETE_USERS_PHONE_KEY_SQL,
+            UPDATE_USERS_PHONE_KEY_SQL,
+        ]),
+    ],
+}
+
+
+def applied_versions(cur):
+    cur.execute("SELECT component, version FROM schema_version")
+    return dict(cur.fetchall())
+
+
+def pending_steps(versions, components):
+    return [
+        (component, version, description, statements)
+        for component in components
+        for version, description, statements in MIGRATIONS[component]
+        if version > versions.get(component, 0)
+    ]
+
+
+def migrate(conn, components=("core",)):
+    cur = conn.cursor()
+    try:
+        # Fast path: one query when the schema is already current
+        try:
+            versions = applied_versions(cur)
+        except errors.UndefinedTable:
+            conn.rollback()
+            versions = {}
+        if not pending_steps(versions, components):
+            conn.commit()
+            return []
+
+        # Serialise concurrent start-ups, then re-read under the lock
+        cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+        cur.execute(SCHEMA_VERSION_SQL)
+        versions = applied_versions(cur)
+        applied = []
+        for component, version, description, statements in pending_steps(versions, components):
+            for sql in statements:
+                cur.execute(sql)
+            cur.execute("""
+                INSERT INTO schema_version (component, version)
+                VALUES (%s, %s)
+                ON CONFLICT (component)
+                DO UPDATE SET version = EXCLUDED.version, applied_at = NOW()
+            """, (component, version))
+            applied.append((component, version, description))
+        conn.commit()
+        return applied
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
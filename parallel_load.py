@@ -0,0 +1,217 @@
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import psycopg2
+
+from db import get_dsn
+from bulk_load import MERGE_SQL, RejectWriter
+from fast_csv import read_contact_batches
+
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+
+# Rows are numbered (chunk index << 32) + line within the chunk, so seq follows
+# file order across chunks and the merge keeps the same first/last-wins rules.
+SEQ_SHIFT = 32
+SEQ_MASK = (1 << SEQ_SHIFT) - 1
+
+
+def split_ranges(file_path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    # Byte ranges that each end on a newline. Contact rows never contain
+    # quoted newlines, so a line boundary is always a record boundary.
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        pos = chunk_bytes
+        while pos < size:
+            f.seek(pos)
+            f.readline()
+            pos = f.tell()
+            if pos >= size:
+                break
+            bounds.append(pos)
+            pos += chunk_bytes
+    bounds.append(size)
+    return [(i, start, end) for i, (start, end) in enumerate(zip(bounds, bounds[1:]))]
+
+
+def parse_range(file_path, index, start, end):
+    # Runs in a worker process: scan and validate one range and return it
+    # as ready-to-COPY CSV bytes plus the rows it rejected.
+    started = time.perf_counter()
+    chunks = []
+    rows = 0
+    lines = 0
+    rejects = []
+    for data, batch_rows, batch_lines, batch_rejects in read_contact_batches(
+            file_path, start, end, seq_base=index << SEQ_SHIFT):
+        chunks.append(data)
+        rows += batch_rows
+        lines += batch_lines
+        rejects.extend(batch_rejects)
+    return {
+        "index": index,
+        "pid": os.getpid(),
+        "bytes": end - start,
+        "lines": lines,
+        "rows": rows,
+        "rejects": rejects,
+        "data": b"".join(chunks),
+        "parse_seconds": time.perf_counter() - started,
+    }
+
+
+def copy_range(staging, data):
+    # Runs on a loader thread with a connection of its own, not a pooled one:
+    # pooled loaders would queue behind the rest of the app (and behind conn,
+    # which holds one for the whole load) instead of copying in parallel
+    started = time.perf_counter()
+    conn = psycopg2.connect(get_dsn())
+    try:
+        with conn.cursor() as cur:
+            cur.copy_expert(
+                f"COPY {staging} (seq, first_name, phone) FROM STDIN WITH (FORMAT csv)",
+                io.BytesIO(data)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return time.perf_counter() - started
+
+
+def print_progress(event, chunk, done, total):
+    if event == "parsed":
+        print(f"  worker {chunk['pid']}: chunk {chunk['index'] + 1}/{total} parsed, "
+              f"{chunk['rows']} rows in {chunk['parse_seconds']:.2f}s")
+    else:
+        print(f"  chunk {chunk['index'] + 1}/{total} copied in {chunk['copy_seconds']:.2f}s "
+              f"({done}/{total} done)")
+
+
+def parallel_load_csv(conn, file_path, on_conflict, workers=None, loaders=None,
+                      chunk_bytes=DEFAULT_CHUNK_BYTES, reject_path=None, progress=print_progress):
+    # Parse in a process pool, COPY every chunk into one shared UNLOGGED
+    # staging table over several loader connections, then run the usual
+    # set-based merge once over the whole file. Unlike bulk_load_csv nothing
+    # reaches phonebook until the final merge commits.
+    if on_conflict not in MERGE_SQL:
+        raise ValueError(f"Unsupported conflict target: {on_conflict}")
+    if reject_path is None:
+        reject_path = file_path + ".rejects.csv"
+    workers = workers or os.cpu_count() or 1
+    loaders = max(1, loaders or workers)
+    max_inflight = workers + loaders
+
+    started = time.perf_counter()
+    staging = f"phonebook_import_{os.getpid()}_{int(time.time())}"
+    ranges = split_ranges(file_path, chunk_bytes)
+    total = len(ranges)
+    lines = {}
+    rejects = []
+    per_worker = {}
+    valid = 0
+    copied = 0
+
+    cur = conn.cursor()
+    try:
+        cur.execute(f"""
+        CREATE UNLOGGED TABLE {staging} (
+            seq BIGINT,
+            first_name TEXT,
+            phone TEXT
+        )
+        """)
+        conn.commit()
+
+        pending = iter(ranges)
+        parsing = {}
+        copying = {}
+        with ProcessPoolExecutor(workers) as parsers, ThreadPoolExecutor(loaders) as copiers:
+            def fill():
+                # Bounded so parsed chunks never pile up faster than COPY drains them
+                while len(parsing) + len(copying) < max_inflight:
+                    task = next(pending, None)
+                    if task is None:
+                        return
+                    parsing[parsers.submit(parse_range, file_path, *task)] = task
+
+            fill()
+            while parsing or copying:
+                done, _ = wait(list(parsing) + list(copying), return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future in parsing:
+                        parsing.pop(future)
+                        chunk = future.result()
+                        lines[chunk["index"]] = chunk["lines"]
+                        rejects.extend((chunk["index"], line, row, reason) for line, row, reason in chunk["rejects"])
+                        valid += chunk["rows"]
+                        worker = per_worker.setdefault(chunk["pid"], {"chunks": 0, "rows": 0, "bytes": 0, "seconds": 0.0})
+                        worker["chunks"] += 1
+                        worker["rows"] += chunk["rows"]
+                        worker["bytes"] += chunk["bytes"]
+                        worker["seconds"] += chunk["parse_seconds"]
+                        if progress:
+                            progress("parsed", chunk, len(lines), total)
+                        data = chunk.pop("data")
+                        copying[copiers.submit(copy_range, staging, data)] = chunk
+                    else:
+                        chunk = copying.pop(future)
+                        chunk["copy_seconds"] = future.result()
+                        copied += 1
+                        if progress:
+                            progress("copied", chunk, copied, total)
+                fill()
+
+        cur.execute(f"ANALYZE {staging}")
+        cur.execute(MERGE_SQL[on_conflict].format(staging=staging))
+        merged_rejects = cur.fetchall() if cur.description else []
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        # A failed DROP must not replace the error that got us here
+        try:
+            cur.execute(f"DROP TABLE IF EXISTS {staging}")
+            conn.commit()
+        except psycopg2.Error as e:
+            if not conn.closed:
+                conn.rollback()
+            print(f"Could not drop staging table {staging}: {e}")
+        finally:
+            cur.close()
+
+    for seq, first_name, phone, reason in merged_rejects:
+        rejects.append((seq >> SEQ_SHIFT, seq & SEQ_MASK, (first_name, phone), reason))
+
+    # Chunk-local line numbers become file line numbers once every chunk is counted
+    offsets = {}
+    line_offset = 0
+    for index in range(total):
+        offsets[index] = line_offset
+        line_offset += lines.get(index, 0)
+    writer = RejectWriter(reject_path)
+    try:
+        for index, line, row, reason in sorted(rejects, key=lambda r: (r[0], r[1])):
+            writer.write(offsets[index] + line, row, reason)
+    finally:
+        writer.close()
+
+    loaded = valid - len(merged_rejects)
+    elapsed = time.perf_counter() - started
+    return {
+        "loaded": loaded,
+        "rejected": writer.count,
+        "reject_path": reject_path if writer.count else None,
+        "seconds": elapsed,
+        "rows_per_sec": loaded / elapsed if elapsed > 0 else 0.0,
+        "chunks": total,
+        "workers": per_worker,
+    }
+
+
+def print_worker_report(stats):
+    for pid, worker in sorted(stats.get("workers", {}).items()):
+        rate = worker["bytes"] / worker["seconds"] / 1e6 if worker["seconds"] > 0 else 0.0
+        print(f"  worker {pid}: {worker['chunks']} chunks, {worker['rows']} rows, {rate:.1f} MB/s parsed")
@@ -1,136 +1,169 @@
-import psycopg2
-import csv
 import pygame
-import random
 import sys
 import os
+import time
 from datetime import datetime
-
-# Database connection
-conn = psycopg2.connect(
-    host="localhost",
-    database="postgres",
-    user="postgres",
-    password="Post9992k"
-)
-
-cur = conn.cursor()
-
-# Create tables
-cur.execute("""
-CREATE TABLE IF NOT EXISTS phonebook (
-    id SERIAL PRIMARY KEY,
-    first_name VARCHAR(50) NOT NULL,
-    phone VARCHAR(20) NOT NULL UNIQUE
-)
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS users (
-    id SERIAL PRIMARY KEY,
-    username VARCHAR(50) UNIQUE NOT NULL
-)
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS user_score (
-    id SERIAL PRIMARY KEY,
-    user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
-    score INTEGER DEFAULT 0,
-    level INTEGER DEFAULT 1
-)
-""")
-cur.execute("""
-CREATE TABLE IF NOT EXISTS leaderboard (
-    id SERIAL PRIMARY KEY,
-    username VARCHAR(50),
-    score INTEGER,
-    level INTEGER,
-    created_at TIMESTAMP DEFAULT NOW()
-)
-""")
-conn.commit()
-
-# Phonebook functions (unchanged)
-def insert_from_csv(file_path):
-    with open(file_path, newline='', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            if len(row) != 2:
-                print("Invalid row:", row)
-                continue
-            first_name, phone = row
-            try:
-                cur.execute(
-                    "INSERT INTO phonebook (first_name, phone) VALUES (%s, %s) ON CONFLICT (phone) DO NOTHING",
-                    (first_name, phone)
-                )
-            except Exception as e:
-                print("Error inserting:", e)
-    conn.commit()
+from db import connection, transaction, close_pool
+from bulk_load import bulk_load_csv, print_load_report
+from parallel_load import parallel_load_csv, print_worker_report
+from migrations import migrate
+from search import search_phonebook, SEARCH_MODES
+from export import stream_rows, export_query, EXPORT_FORMATS
+from snake_engine import SnakeGame, UP, DOWN, LEFT, RIGHT
+from snake_render import SnakeRenderer
+from progress_writer import get_progress_writer, close_progress_writer
+from leaderboard import get_top_board, query_leaderboard
+from players import get_or_create_users
+from query_stats import print_query_stats, export_query_stats
+from phones import phone_key
+from bulk_edit import delete_users, update_users, read_identifiers, read_changes, print_rejects, print_bulk_report
+from replay import ReplayRecorder, new_seed, verify_replay
+from game_loop import FixedStepLoop, InputQueue, interpolate
+from cache import lookup_name, lookup_phones, cached_search, invalidate_contacts, invalidate_all, cache_stats
+
+# Schema setup: applies only the migrations this database is missing
+def setup_schema():
+    with connection() as conn:
+        for component, version, description in migrate(conn, ("core",)):
+            print(f"Applied migration {component} {version}: {description}")
+
+# Phonebook functions
+def insert_from_csv(file_path, chunk_size=50000, workers=None):
+    try:
+        with connection() as conn:
+            if workers:
+                stats = parallel_load_csv(conn, file_path, "phone", workers=workers)
+            else:
+                stats = bulk_load_csv(conn, file_path, "phone", chunk_size=chunk_size)
+    except Exception as e:
+        print("Error inserting:", e)
+        return
+    finally:
+        # Chunks commit as they go, so even a failed import may have written rows
+        invalidate_all()
+    print_load_report(stats)
+    print_worker_report(stats)
     print("CSV data inserted.")
 
 def insert_from_console():
     first_name = input("Name: ").strip()
     phone = input("Phone: ").strip()
     try:
-        cur.execute(
-            "INSERT INTO phonebook (first_name, phone) VALUES (%s, %s) ON CONFLICT (phone) DO NOTHING",
-            (first_name, phone)
-        )
-        conn.commit()
+        with transaction() as cur:
+            cur.execute(
+                "INSERT INTO phonebook (first_name, phone) VALUES (%s, %s) ON CONFLICT (phone) DO NOTHING",
+                (first_name, phone)
+            )
+        invalidate_contacts(names=[first_name], phones=[phone])
         print("Data inserted)")
     except Exception as e:
         print("Error inserting:", e)
 
 def update_user(old_phone_or_name, new_name=None, new_phone=None):
-    if new_name:
-        cur.execute(
-            "UPDATE phonebook SET first_name=%s WHERE phone=%s OR first_name=%s",
-            (new_name, old_phone_or_name, old_phone_or_name)
-        )
-    if new_phone:
-        cur.execute(
-            "UPDATE phonebook SET phone=%s WHERE phone=%s OR first_name=%s",
-            (new_phone, old_phone_or_name, old_phone_or_name)
-        )
-    conn.commit()
+    with transaction() as cur:
+        if new_name:
+            cur.execute(
+                "UPDATE phonebook SET first_name=%s WHERE phone_norm=%s OR first_name=%s",
+                (new_name, phone_key(old_phone_or_name), old_phone_or_name)
+            )
+        if new_phone:
+            cur.execute(
+                "UPDATE phonebook SET phone=%s WHERE phone_norm=%s OR first_name=%s",
+                (new_phone, phone_key(old_phone_or_name), old_phone_or_name)
+            )
+    invalidate_contacts(names=[old_phone_or_name, new_name], phones=[old_phone_or_name, new_phone])
     print("Data updated.")
 
-def query_users(filter_text=None):
+def query_users(filter_text=None, mode="substring", limit=50):
     if filter_text:
-        cur.execute(
-            "SELECT * FROM phonebook WHERE first_name ILIKE %s OR phone ILIKE %s",
-            (f"%{filter_text}%", f"%{filter_text}%")
-        )
+        def fetch():
+            with transaction() as cur:
+                return search_phonebook(cur, filter_text, mode=mode, limit=limit)
+        rows = cached_search(("query_users", filter_text, mode, limit), fetch)
+        for row in rows:
+            print(row)
     else:
-        cur.execute("SELECT * FROM phonebook")
-    rows = cur.fetchall()
-    for row in rows:
-        print(row)
+        with connection() as conn:
+            for row in stream_rows(conn, "SELECT id, first_name, phone FROM phonebook ORDER BY id"):
+                print(row)
+
+def export_phonebook(path, fmt="csv"):
+    with connection() as conn:
+        count = export_query(
+            conn, "SELECT id, first_name, phone FROM phonebook ORDER BY id",
+            path, ["id", "first_name", "phone"], fmt
+        )
+    print(f"Exported {count} rows to {path}.")
 
 def delete_user(identifier):
-    cur.execute(
-        "DELETE FROM phonebook WHERE first_name=%s OR phone=%s",
-        (identifier, identifier)
-    )
-    conn.commit()
+    with transaction() as cur:
+        cur.execute(
+            "DELETE FROM phonebook WHERE first_name=%s OR phone_norm=%s",
+            (identifier, phone_key(identifier))
+        )
+    invalidate_contacts(names=[identifier], phones=[identifier])
     print("udaleno")
 
+def bulk_delete_users(identifiers):
+    # One statement, one transaction: either every identifier is applied or none
+    try:
+        with transaction() as cur:
+            results = delete_users(cur, identifiers)
+    except Exception as e:
+        print("Error deleting:", e)
+        return
+    invalidate_contacts(names=identifiers, phones=identifiers)
+    print_bulk_report(results, "deleted")
+
+def bulk_update_users(changes):
+    try:
+        with transaction() as cur:
+            results = update_users(cur, changes)
+    except Exception as e:
+        print("Error updating:", e)
+        return
+    invalidate_contacts(
+        names=[c[0] for c in changes] + [c[1] for c in changes],
+        phones=[c[0] for c in changes] + [c[2] for c in changes]
+    )
+    print_bulk_report(results, "updated")
+
+def lookup_contact(identifier):
+    name = lookup_name(identifier)
+    if name is not None:
+        print(f"{identifier} belongs to {name}")
+        return
+    phones = lookup_phones(identifier)
+    if phones:
+        print(f"{identifier}: {', '.join(phones)}")
+    else:
+        print("No contact found.")
+
+def print_cache_stats():
+    for name, stats in cache_stats().items():
+        print(f"{name}: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['evictions']} evictions, {stats['size']} entries")
+
+def show_query_stats():
+    print_query_stats()
+    path = input("Export full stats to JSON file (or press Enter to skip): ").strip()
+    if path:
+        try:
+            count = export_query_stats(path)
+            print(f"Exported stats for {count} statements to {path}")
+        except OSError as e:
+            print("Error exporting stats:", e)
+
 # Snake game DB functions
 def get_or_create_user(username):
-    cur.execute("SELECT id FROM users WHERE username=%s", (username,))
-    row = cur.fetchone()
-    if row:
-        user_id = row[0]
-        print(f"Welcome back, {username}!")
-    else:
-        cur.execute("INSERT INTO users (username) VALUES (%s) RETURNING id", (username,))
-        user_id = cur.fetchone()[0]
-        conn.commit()
+    player = get_or_create_users([username])[username]
+    user_id = player["user_id"]
+    if player["created"]:
         print(f"Created user: {username}")
-    cur.execute("SELECT score, level FROM user_score WHERE user_id=%s ORDER BY id DESC LIMIT 1", (user_id,))
-    score_row = cur.fetchone()
-    if score_row:
-        score, level = score_row
+    else:
+        print(f"Welcome back, {username}!")
+    if player["score"] is not None:
+        score, level = player["score"], player["level"]
         print(f"Your last score: {score}, Level: {level}")
     else:
         score = 0
@@ -138,51 +171,33 @@ def get_or_create_user(username):
         print("U never played so starting from 0")
     return user_id, score, level
 
-def save_progress(user_id, username, score, level):
-    cur.execute(
-        "INSERT INTO user_score (user_id, score, level) VALUES (%s, %s, %s)",
-        (user_id, score, level)
-    )
-    cur.execute("SELECT id, score FROM leaderboard WHERE username=%s", (username,))
-    row = cur.fetchone()
-    if row:
-        existing_id, existing_score = row
-        if score > existing_score:
-            cur.execute("""
-                UPDATE leaderboard
-                SET score=%s, level=%s, created_at=NOW()
-                WHERE id=%s
-            """, (score, level, existing_id))
-            print("Leaderboard updated with new high score!")
-        else:
-            print("Score saved, but not higher than your best.")
-    else:
-        cur.execute("""
-            INSERT INTO leaderboard (username, score, level)
-            VALUES (%s, %s, %s)
-        """, (username, score, level))
-        print("New leaderboard entry created.")
-    conn.commit()
+def save_progress(user_id, username, score, level, replay=None):
+    # The claimed score is re-simulated from the replay before it can reach
+    # the leaderboard; then written in the background so the game loop never
+    # waits on the database. The top board picks it up once the write commits.
+    if replay is not None and not verify_replay(replay, score, level):
+        print("Score could not be verified against the replay; not saved.")
+        return
+    get_progress_writer().submit(user_id, username, score, level, replay)
     print("Progress saved.")
 
-def show_leaderboard():
-    cur.execute("""
-    SELECT username, score, level, created_at
-    FROM leaderboard
-    ORDER BY score DESC
-    LIMIT 10
-    """)
-    rows = cur.fetchall()
-    print("\n--- Top 10 Best Runs ---")
+def show_leaderboard(level=None, window=None):
+    rows = query_leaderboard(level=level, window=window)
+    title = "Top 10 Best Runs"
+    if level is not None:
+        title += f", Level {level}"
+    if window is not None:
+        title += f", {window}"
+    print(f"\n--- {title} ---")
     for i, row in enumerate(rows, 1):
         username, score, level, created_at = row
         print(f"{i}. {username}: {score} points, Level {level}, at {created_at}")
 
 def close_connection():
-    cur.close()
-    conn.close()
+    close_progress_writer()
+    close_pool()
 
-# Snake Game Function (level reset + better visuals)
+# Snake Game Function: pygame input and drawing on top of snake_engine.SnakeGame
 def snake_game(user_id, username, last_level):
     pygame.init()
 
@@ -190,120 +205,87 @@ def snake_game(user_id, username, last_level):
     BLOCK_SIZE = 20
     GRID_WIDTH = WIDTH // BLOCK_SIZE
     GRID_HEIGHT = HEIGHT // BLOCK_SIZE
-
-    BACKGROUND_COLOR = (30, 30, 30)
-    TEXT_COLOR = (255, 255, 255)
+    RENDER_FPS = 60
 
     screen = pygame.display.set_mode((WIDTH, HEIGHT))
     pygame.display.set_caption("Snake Game")
     font = pygame.font.SysFont("Arial", 24)
     clock = pygame.time.Clock()
 
-    def draw_text(text, x, y, color=TEXT_COLOR):
-        label = font.render(text, True, color)
-        screen.blit(label, (x, y))
+    renderer = SnakeRenderer(screen, font, BLOCK_SIZE)
 
-    def generate_food(snake):
-        while True:
-            x = random.randint(0, GRID_WIDTH - 1)
-            y = random.randint(0, GRID_HEIGHT - 1)
-            if (x, y) not in snake:
-                weight = random.randint(1, 3)
-                timer = random.randint(30, 60)
-                # Random bright color for food
-                color = (
-                    random.randint(128, 255),
-                    random.randint(128, 255),
-                    random.randint(128, 255)
-                )
-                return {"pos": (x, y), "weight": weight, "timer": timer, "color": color}
+    seed = new_seed()
+    game = SnakeGame(GRID_WIDTH, GRID_HEIGHT, seed=seed)
+    recorder = ReplayRecorder(seed, GRID_WIDTH, GRID_HEIGHT)
+    key_actions = {
+        pygame.K_UP: UP,
+        pygame.K_DOWN: DOWN,
+        pygame.K_LEFT: LEFT,
+        pygame.K_RIGHT: RIGHT,
+    }
 
-    snake = [(5, 5), (4, 5), (3, 5)]
-    direction = (1, 0)
-    food = generate_food(snake)
-    score = 0
-    level = 0
-    speed = 10
+    # Simulation runs at the level's tick rate, input and drawing at RENDER_FPS
+    loop = FixedStepLoop(game.speed)
+    inputs = InputQueue()
+    previous = list(game.snake)
+    show_stats = False
 
     hue = 0  # for snake color cycling
 
     running = True
     while running:
-        screen.fill(BACKGROUND_COLOR)
-
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
             elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_UP and direction != (0, 1):
-                    direction = (0, -1)
-                elif event.key == pygame.K_DOWN and direction != (0, -1):
-                    direction = (0, 1)
-                elif event.key == pygame.K_LEFT and direction != (1, 0):
-                    direction = (-1, 0)
-                elif event.key == pygame.K_RIGHT and direction != (-1, 0):
-                    direction = (1, 0)
+                if event.key in key_actions:
+                    inputs.push(key_actions[event.key], game.direction)
                 elif event.key == pygame.K_p:
-                    save_progress(user_id, username, score, level)
+                    save_progress(user_id, username, game.score, game.level, recorder.snapshot())
                     print("Paused and saved progress.")
-
-        head_x, head_y = snake[0]
-        dx, dy = direction
-        new_head = (head_x + dx, head_y + dy)
-
-        if (new_head[0] < 0 or new_head[0] >= GRID_WIDTH or
-            new_head[1] < 0 or new_head[1] >= GRID_HEIGHT or
-            new_head in snake[:-1]):
+                elif event.key == pygame.K_F3:
+                    show_stats = not show_stats
+
+        for _ in range(loop.frame()):
+            started = time.perf_counter()
+            previous = list(game.snake)
+            state, reward, done = game.step(inputs.pop())
+            recorder.record(game.direction)
+            loop.record_tick(time.perf_counter() - started)
+            loop.tick_rate = game.speed
+            # Update hue for snake rainbow effect
+            hue = (hue + 2) % 360
+            if done:
+                break
+        if game.done:
             print("Game Over!")
-            save_progress(user_id, username, score, level)
+            save_progress(user_id, username, game.score, game.level, recorder.snapshot())
             running = False
             continue
 
-        snake.insert(0, new_head)
-
-        if new_head == food["pos"]:
-            score += food["weight"]
-            if score % 5 == 0:
-                level += 1
-                speed += 1
-            food = generate_food(snake)
-        else:
-            snake.pop()
-            food["timer"] -= 1
-            if food["timer"] <= 0:
-                food = generate_food(snake)
-
-        # Update hue for snake rainbow effect
-        hue = (hue + 2) % 360
-
-        # Draw snake segments
-        for i, segment in enumerate(snake):
-            x, y = segment
-            # Each segment gets a slightly different hue
-            segment_hue = (hue + i * 10) % 360
-            # Convert HSV to RGB
-            color = pygame.Color(0)
-            color.hsva = (segment_hue, 100, 100, 100)
-            pygame.draw.rect(screen, color, (x * BLOCK_SIZE, y * BLOCK_SIZE, BLOCK_SIZE, BLOCK_SIZE), border_radius=4)
-
-        # Draw colorful food
-        fx, fy = food["pos"]
-        center = (fx * BLOCK_SIZE + BLOCK_SIZE // 2, fy * BLOCK_SIZE + BLOCK_SIZE // 2)
-        radius = BLOCK_SIZE // 2 - 2
-        pygame.draw.circle(screen, food["color"], center, radius)
-
-        draw_text(f"Score: {score}", 10, 10)
-        draw_text(f"Level: {level}", 10, 40)
-        draw_text(f"Speed: {speed}", 10, 70)
-        draw_text(f"Press 'P' to Save", 10, HEIGHT - 30)
-
-        pygame.display.flip()
-        clock.tick(speed)
-
+        hud = [
+            (f"Score: {game.score}", (10, 10)),
+            (f"Level: {game.level}", (10, 40)),
+            (f"Speed: {game.speed}", (10, 70)),
+            ("Press 'P' to Save", (10, HEIGHT - 30)),
+        ]
+        if show_stats:
+            stats = loop.stats()
+            hud.append((f"{stats['fps']:.0f} fps, frame {stats['frame_ms_avg']:.1f} ms, "
+                        f"tick {stats['tick_ms_avg']:.2f} ms", (WIDTH - 420, 10)))
+        renderer.draw(interpolate(previous, game.snake, loop.alpha), game.food, hue, hud)
+        clock.tick(RENDER_FPS)
+
+    stats = loop.stats()
+    print(f"Frames: {stats['fps']:.0f} fps, avg {stats['frame_ms_avg']:.1f} ms, max {stats['frame_ms_max']:.1f} ms; "
+          f"ticks: {stats['ticks_per_sec']:.1f}/s, avg {stats['tick_ms_avg']:.2f} ms, "
+          f"{stats['dropped_ticks']} dropped")
     pygame.quit()
 
 # Main Menu
 if __name__ == "__main__":
+    setup_schema()
+    get_top_board()
     while True:
         print("\nMain Menu:")
         print("1. Insert from CSV")
@@ -313,12 +295,19 @@ if __name__ == "__main__":
         print("5. Delete User")
         print("6. Snake Game")
         print("7. 10 Best Runs")
-        print("8. Exit")
+        print("8. Export Phonebook")
+        print("9. Lookup Contact")
+        print("10. Cache Stats")
+        print("11. Query Stats")
+        print("12. Bulk Delete")
+        print("13. Bulk Update")
+        print("14. Exit")
         choice = input("Choose option ")
 
         if choice == "1":
             path = input("Enter CSV file path: ")
-            insert_from_csv(path)
+            workers = input("Parallel workers (or press Enter for a single process): ").strip()
+            insert_from_csv(path, workers=int(workers) if workers.isdigit() else None)
         elif choice == "2":
             insert_from_console()
         elif choice == "3":
@@ -328,7 +317,13 @@ if __name__ == "__main__":
             update_user(idf, new_name=new_n if new_n else None, new_phone=new_p if new_p else None)
         elif choice == "4":
             f = input("Enter filter text (or press Enter for all): ")
-            query_users(f if f else None)
+            mode = "substring"
+            if f:
+                mode = input(f"Search mode {'/'.join(SEARCH_MODES)} (Enter for substring): ").strip() or "substring"
+            try:
+                query_users(f if f else None, mode=mode)
+            except ValueError as e:
+                print(e)
         elif choice == "5":
             idf = input("Enter username or phone to delete: ")
             delete_user(idf)
@@ -337,8 +332,46 @@ if __name__ == "__main__":
             user_id, last_score, last_level = get_or_create_user(username)
             snake_game(user_id, username, last_level)
         elif choice == "7":
-            show_leaderboard()
+            f = input("Filter: level number, 'today', 'week' (or press Enter for all time): ").strip()
+            try:
+                if f.isdigit():
+                    show_leaderboard(level=int(f))
+                else:
+                    show_leaderboard(window=f or None)
+            except ValueError as e:
+                print(e)
         elif choice == "8":
+            path = input("Enter export file path: ").strip()
+            fmt = input(f"Format {'/'.join(EXPORT_FORMATS)} (Enter for csv): ").strip() or "csv"
+            try:
+                export_phonebook(path, fmt)
+            except Exception as e:
+                print("Error exporting:", e)
+        elif choice == "9":
+            idf = input("Enter name or phone to look up: ").strip()
+            lookup_contact(idf)
+        elif choice == "10":
+            print_cache_stats()
+        elif choice == "11":
+            show_query_stats()
+        elif choice == "12":
+            path = input("File with one name or phone per line: ").strip()
+            try:
+                identifiers = read_identifiers(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print("Error reading file:", e)
+            else:
+                bulk_delete_users(identifiers)
+        elif choice == "13":
+            path = input("CSV file of name or phone,new name,new phone: ").strip()
+            try:
+                changes, rejects = read_changes(path)
+            except (OSError, UnicodeDecodeError) as e:
+                print("Error reading file:", e)
+            else:
+                print_rejects(rejects)
+                bulk_update_users(changes)
+        elif choice == "14":
             break
         else:
             print("Invalid choice. Try again.")
@@ -0,0 +1,175 @@
+import asyncio
+import os
+import re
+
+import asyncpg
+
+from psycopg2.extensions import parse_dsn
+
+from db import connect_params
+from phones import phone_key
+from search import SEARCH_SQL, search_params
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+# Same effect as the upsert_phonebook_user procedure, but only needs the core
+# tables, which is all this module can count on being migrated
+UPSERT_SQL = """
+    WITH updated AS (
+        UPDATE phonebook SET phone = $2 WHERE first_name = $1 RETURNING id
+    )
+    INSERT INTO phonebook (first_name, phone)
+    SELECT $1, $2 WHERE NOT EXISTS (SELECT 1 FROM updated)
+"""
+
+
+def _asyncpg_sql(sql):
+    # search.SEARCH_SQL is written for psycopg2 (%(name)s); asyncpg wants $n,
+    # with a repeated name reusing its number
+    names = []
+
+    def number(match):
+        if match.group(1) not in names:
+            names.append(match.group(1))
+        return f"${names.index(match.group(1)) + 1}"
+
+    return re.sub(r"%\((\w+)\)s", number, sql).replace("%%", "%"), names
+
+
+ASYNC_SEARCH_SQL = {mode: _asyncpg_sql(sql) for mode, sql in SEARCH_SQL.items()}
+
+
+def _dsn_kwargs(dsn):
+    # asyncpg only understands postgres:// URIs, so "host=... dbname=..."
+    # strings (what db.py accepts) are split into keyword arguments
+    params = parse_dsn(dsn)
+    if "dbname" in params:
+        params["database"] = params.pop("dbname")
+    if "port" in params:
+        params["port"] = int(params["port"])
+    return params
+
+
+async def get_pool():
+    # Separate from db.py's psycopg2 pool; created on the first awaited call
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                min_size = int(os.environ.get("PHONEBOOK_ASYNC_POOL_MIN", "5"))
+                max_size = int(os.environ.get("PHONEBOOK_ASYNC_POOL_MAX", "50"))
+                dsn = os.environ.get("PHONEBOOK_DSN")
+                if dsn and dsn.startswith(("postgres://", "postgresql://")):
+                    _pool = await asyncpg.create_pool(dsn, min_size=min_size, max_size=max_size)
+                elif dsn:
+                    _pool = await asyncpg.create_pool(min_size=min_size, max_size=max_size, **_dsn_kwargs(dsn))
+                else:
+                    params = connect_params()
+                    _pool = await asyncpg.create_pool(
+                        host=params["host"],
+                        database=params["dbname"],
+                        user=params["user"],
+                        password=params["password"],
+                        min_size=min_size,
+                        max_size=max_size,
+                    )
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def _affected(status):
+    # asyncpg returns the command tag, e.g. "DELETE 3"
+    return int(status.split()[-1])
+
+
+async def insert_contact(first_name, phone):
+    pool = await get_pool()
+    status = await pool.execute(
+        "INSERT INTO phonebook (first_name, phone) VALUES ($1, $2) ON CONFLICT (phone) DO NOTHING",
+        first_name, phone
+    )
+    return _affected(status) > 0
+
+
+async def upsert_contact(first_name, phone):
+    pool = await get_pool()
+    await pool.execute(UPSERT_SQL, first_name, phone)
+
+
+async def update_contact(old_phone_or_name, new_name=None, new_phone=None):
+    set_clauses = []
+    values = []
+    if new_name:
+        values.append(new_name)
+        set_clauses.append(f"first_name=${len(values)}")
+    if new_phone:
+        values.append(new_phone)
+        set_clauses.append(f"phone=${len(values)}")
+    if not set_clauses:
+        return 0
+    values.extend([old_phone_or_name, phone_key(old_phone_or_name)])
+    n = len(values)
+    pool = await get_pool()
+    status = await pool.execute(
+        f"UPDATE phonebook SET {', '.join(set_clauses)} WHERE first_name=${n - 1} OR phone_norm=${n}",
+        *values
+    )
+    return _affected(status)
+
+
+async def delete_contact(identifier):
+    pool = await get_pool()
+    status = await pool.execute(
+        "DELETE FROM phonebook WHERE first_name=$1 OR phone_norm=$2", identifier, phone_key(identifier)
+    )
+    return _affected(status)
+
+
+async def lookup_by_phone(phone):
+    pool = await get_pool()
+    key = phone_key(phone)
+    if key is None:
+        return None
+    return await pool.fetchval("SELECT first_name FROM phonebook WHERE phone_norm=$1 ORDER BY id LIMIT 1", key)
+
+
+async def lookup_by_name(first_name):
+    pool = await get_pool()
+    rows = await pool.fetch("SELECT phone FROM phonebook WHERE first_name=$1 ORDER BY id", first_name)
+    return [row["phone"] for row in rows]
+
+
+async def search_contacts(pattern, mode="substring", limit=50):
+    if mode not in ASYNC_SEARCH_SQL:
+        raise ValueError(f"Unknown search mode: {mode}")
+    sql, names = ASYNC_SEARCH_SQL[mode]
+    params = search_params(pattern, limit)
+    pool = await get_pool()
+    return await pool.fetch(sql, *[params[name] for name in names])
+
+
+async def query_contacts(filter_text=None, mode="substring", limit=50):
+    if filter_text:
+        return await search_contacts(filter_text, mode, limit)
+    pool = await get_pool()
+    return await pool.fetch(
+        "SELECT id, first_name, phone FROM phonebook ORDER BY id LIMIT $1", limit
+    )
+
+
+async def iter_contacts(prefetch=2000):
+    # Streams the whole table through a server-side cursor
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        async with conn.transaction():
+            async for record in conn.cursor(
+                "SELECT id, first_name, phone FROM phonebook ORDER BY id", prefetch=prefetch
+            ):
+                yield record
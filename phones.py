@@ -0,0 +1,79 @@
+import re
+
+_NON_DIGITS = re.compile(r"[^0-9]")
+
+# Canonical phone: digits only, E.164 without the '+'. Kazakh/Russian numbers
+# written with the 8 trunk prefix ("8 747 ...") become 7...; "+7 (747) ..."
+# already is. Must stay identical to the SQL normalize_phone() below, which
+# feeds the phonebook.phone_norm generated column.
+NORMALIZE_PHONE_SQL = r"""
+CREATE OR REPLACE FUNCTION normalize_phone(p TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+RETURNS NULL ON NULL INPUT
+AS $$
+    SELECT CASE WHEN d ~ '^8[0-9]{10}$' THEN '7' || substr(d, 2) ELSE d END
+    FROM (SELECT regexp_replace(p, '[^0-9]', '', 'g') AS d) AS digits;
+$$;
+"""
+
+PHONE_NORM_SQL = [
+    NORMALIZE_PHONE_SQL,
+    """
+    ALTER TABLE phonebook
+    ADD COLUMN IF NOT EXISTS phone_norm TEXT
+    GENERATED ALWAYS AS (normalize_phone(phone)) STORED
+    """,
+    # text_pattern_ops serves both = and the ~>=~/~<~ prefix ranges
+    """
+    CREATE INDEX IF NOT EXISTS phonebook_phone_norm_idx
+    ON phonebook (phone_norm text_pattern_ops)
+    """,
+    # Digit prefix search now goes through phone_norm
+    "DROP INDEX IF EXISTS phonebook_phone_digits_idx",
+]
+
+# SQL twin of phone_key() below, for lookups done inside procedures
+PHONE_KEY_SQL = r"""
+CREATE OR REPLACE FUNCTION phone_key(p TEXT)
+RETURNS TEXT
+LANGUAGE sql
+IMMUTABLE
+PARALLEL SAFE
+RETURNS NULL ON NULL INPUT
+AS $$
+    SELECT CASE WHEN p ~ '[[:alpha:]]' THEN NULL ELSE NULLIF(normalize_phone(p), '') END;
+$$;
+"""
+
+
+def normalize_phone(phone):
+    if phone is None:
+        return None
+    digits = _NON_DIGITS.sub("", phone)
+    if len(digits) == 11 and digits[0] == "8":
+        return "7" + digits[1:]
+    return digits
+
+
+def phone_key(identifier):
+    # Value to compare with phone_norm, or None when the identifier is a name:
+    # no digits (a plain name must not match every phone_norm = '') or any
+    # letter ("Room 101" is not phone 101). Everything insert_many_users
+    # accepts as a phone ('^[0-9\-\+]+$') has no letters, so it still counts.
+    if identifier is None or any(c.isalpha() for c in identifier):
+        return None
+    return normalize_phone(identifier) or None
+
+
+def phone_prefixes(text):
+    # Canonical prefixes a typed digit prefix can stand for: "8747" may be
+    # the start of a trunk-prefixed number, stored as 7747...
+    digits = _NON_DIGITS.sub("", text)
+    if not digits:
+        return []
+    if digits[0] == "8" and len(digits) <= 11:
+        return ["7" + digits[1:], digits]
+    return [digits]
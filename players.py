@@ -0,0 +1,38 @@
+from db import transaction
+
+
+def get_or_create_users(usernames):
+    # Two round trips for any number of players: create the missing ones,
+    # then fetch every id with its latest score/level (user_score_user_id_idx).
+    names = list(dict.fromkeys(usernames))
+    if not names:
+        return {}
+    with transaction() as cur:
+        cur.execute("""
+            INSERT INTO users (username)
+            SELECT unnest(%s::text[])
+            ON CONFLICT (username) DO NOTHING
+            RETURNING username
+        """, (names,))
+        created = {row[0] for row in cur.fetchall()}
+        cur.execute("""
+            SELECT u.id, u.username, s.score, s.level
+            FROM users u
+            LEFT JOIN (
+                SELECT DISTINCT ON (user_id) user_id, score, level
+                FROM user_score
+                WHERE user_id IN (SELECT id FROM users WHERE username = ANY(%s))
+                ORDER BY user_id, id DESC
+            ) s ON s.user_id = u.id
+            WHERE u.username = ANY(%s)
+        """, (names, names))
+        rows = cur.fetchall()
+    return {
+        username: {
+            "user_id": user_id,
+            "score": score,
+            "level": level,
+            "created": username in created,
+        }
+        for user_id, username, score, level in rows
+    }
@@ -0,0 +1,157 @@
+import atexit
+import queue
+import threading
+import time
+
+from psycopg2.extras import execute_values
+
+from db import transaction
+from leaderboard import get_top_board
+from replay import save_replays
+
+_STOP = object()
+
+# Keeps the best run per user; a lower score never overwrites a higher one,
+# whichever session gets there first.
+LEADERBOARD_UPSERT_SQL = """
+    INSERT INTO leaderboard (username, score, level)
+    VALUES %s
+    ON CONFLICT (username)
+    DO UPDATE SET score = EXCLUDED.score, level = EXCLUDED.level, created_at = NOW()
+    WHERE EXCLUDED.score > leaderboard.score
+"""
+
+
+class ProgressWriter:
+    # Game code calls submit() and carries on; a background thread coalesces
+    # saves per user and writes them in batches.
+    def __init__(self, flush_interval=1.0, max_batch=500):
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.queue = queue.Queue()
+        self.pending = {}
+        self.flushed = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_id, username, score, level, replay=None):
+        self.queue.put((user_id, username, score, level, replay))
+
+    def _coalesce(self, user_id, username, score, level, replay=None):
+        # Latest save goes to user_score, best one (and its replay) to the leaderboard
+        entry = self.pending.get(user_id)
+        if entry is None:
+            self.pending[user_id] = {
+                "username": username,
+                "latest": (score, level),
+                "best": (score, level),
+                "replay": replay,
+            }
+        else:
+            entry["latest"] = (score, level)
+            if score > entry["best"][0]:
+                entry["best"] = (score, level)
+                entry["replay"] = replay
+
+    def _run(self):
+        deadline = time.monotonic() + self.flush_interval
+        stopping = False
+        while not stopping:
+            timeout = max(0.0, deadline - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+                if item is _STOP:
+                    stopping = True
+                else:
+                    self._coalesce(*item)
+                    if len(self.pending) < self.max_batch:
+                        continue
+            except queue.Empty:
+                pass
+            # Drain whatever else is already queued before writing
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                else:
+                    self._coalesce(*item)
+            if self.pending:
+                self._flush()
+            deadline = time.monotonic() + self.flush_interval
+
+    def _flush(self):
+        batch, self.pending = self.pending, {}
+        try:
+            write_batch(batch)
+            self.flushed += len(batch)
+        except Exception as e:
+            self.errors += 1
+            print("Error saving progress:", e)
+            # Put the batch back so the next flush retries it
+            for user_id, entry in batch.items():
+                self._coalesce(user_id, entry["username"], *entry["best"], entry["replay"])
+                self._coalesce(user_id, entry["username"], *entry["latest"])
+            return
+        # The in-memory top board only ever shows scores that are committed
+        try:
+            board = get_top_board()
+        except Exception as e:
+            print("Error loading the leaderboard:", e)
+            return
+        for entry in batch.values():
+            board.record(entry["username"], *entry["best"])
+
+    def close(self, timeout=10.0):
+        if self._thread.is_alive():
+            self.queue.put(_STOP)
+            self._thread.join(timeout)
+        if self.pending:
+            print(f"{len(self.pending)} progress saves could not be written.")
+
+
+def write_batch(batch):
+    with transaction() as cur:
+        execute_values(
+            cur,
+            "INSERT INTO user_score (user_id, score, level) VALUES %s",
+            [(user_id, *entry["latest"]) for user_id, entry in batch.items()]
+        )
+        execute_values(
+            cur,
+            LEADERBOARD_UPSERT_SQL,
+            [(entry["username"], *entry["best"]) for entry in batch.values()]
+        )
+        replays = [
+            (user_id, entry["username"], entry["replay"], *entry["best"])
+            for user_id, entry in batch.items()
+            if entry["replay"] is not None
+        ]
+        if replays:
+            save_replays(cur, replays)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_progress_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = ProgressWriter()
+                atexit.register(close_progress_writer)
+    return _writer
+
+
+def close_progress_writer():
+    # Drains pending saves; called on menu exit and again (no-op) at interpreter exit
+    global _writer
+    with _writer_lock:
+        if _writer is not None:
+            _writer.close()
+            _writer = None
@@ -0,0 +1,261 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from psycopg2.extensions import cursor as _cursor
+
+ENABLED = os.environ.get("PHONEBOOK_QUERY_STATS", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("PHONEBOOK_SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.environ.get("PHONEBOOK_SLOW_QUERY_LOG")          # JSON lines, appended
+EXPLAIN_MS = float(os.environ.get("PHONEBOOK_EXPLAIN_MS", "0"))       # 0 = never EXPLAIN
+
+# Upper bounds in milliseconds; the last bucket catches everything slower
+HISTOGRAM_BOUNDS_MS = [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+
+# Fingerprinting: literals and placeholders become ?, lists of them collapse
+_COMMENT = re.compile(r"--[^\n]*")
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_PLACEHOLDER = re.compile(r"%\(\w+\)s|%s")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+_ARRAY = re.compile(r"ARRAY\[[^\]]*\]", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+_fingerprints = {}
+FINGERPRINT_CACHE_SIZE = 2000
+
+
+def fingerprint(sql):
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        # psycopg2.sql.Composed and friends
+        sql = str(sql)
+    cached = _fingerprints.get(sql)
+    if cached is not None:
+        return cached
+    text = _COMMENT.sub(" ", sql)
+    text = _STRING.sub("?", text)
+    text = _PLACEHOLDER.sub("?", text)
+    text = _NUMBER.sub("?", text)
+    text = _ARRAY.sub("ARRAY[?]", text)
+    text = _LIST.sub("(?)", text)
+    text = _ROWS.sub("(?)", text)
+    text = _SPACE.sub(" ", text).strip()
+    # execute_values inlines its rows, so unbounded distinct strings reach here
+    if len(_fingerprints) >= FINGERPRINT_CACHE_SIZE:
+        _fingerprints.clear()
+    _fingerprints[sql] = text
+    return text
+
+
+class StatementStats:
+    def __init__(self, query):
+        self.query = query
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)
+        self.last_error = None
+
+    def add(self, ms, rows, error):
+        self.calls += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        if rows is not None and rows > 0:
+            self.rows += rows
+        if error is not None:
+            self.errors += 1
+            self.last_error = error
+        for i, bound in enumerate(HISTOGRAM_BOUNDS_MS):
+            if ms <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+    def percentile(self, pct):
+        # Bucket upper bound; the overflow bucket reports the slowest call seen
+        target = self.calls * pct / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max_ms
+        return None
+
+    def as_dict(self):
+        return {
+            "query": self.query,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.calls, 3) if self.calls else None,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "histogram": dict(zip([str(b) for b in HISTOGRAM_BOUNDS_MS] + ["inf"], self.buckets)),
+            "last_error": self.last_error,
+        }
+
+
+class QueryStats:
+    # Process-wide registry fed by InstrumentedCursor, one entry per fingerprint
+    def __init__(self, slow_ms=SLOW_QUERY_MS, slow_log=SLOW_QUERY_LOG, explain_ms=EXPLAIN_MS):
+        self.slow_ms = slow_ms
+        self.slow_log = slow_log
+        self.explain_ms = explain_ms
+        self.statements = {}
+        self.slow = deque(maxlen=100)
+        self._lock = threading.Lock()
+
+    def record(self, query, ms, rows, error=None):
+        with self._lock:
+            stats = self.statements.get(query)
+            if stats is None:
+                stats = self.statements[query] = StatementStats(query)
+            stats.add(ms, rows, error)
+
+    def record_slow(self, query, sql, ms, rows, error=None, plan=None):
+        entry = {
+            "at": datetime.now().isoformat(timespec="milliseconds"),
+            "ms": round(ms, 3),
+            "rows": rows,
+            "query": query,
+            "statement": sql[:2000],
+            "error": error,
+            "plan": plan,
+        }
+        with self._lock:
+            self.slow.append(entry)
+            if self.slow_log:
+                try:
+                    with open(self.slow_log, "a", encoding="utf-8") as f:
+                        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                except OSError as e:
+                    print("Error writing slow query log:", e)
+
+    def snapshot(self, order_by="total_ms"):
+        with self._lock:
+            rows = [stats.as_dict() for stats in self.statements.values()]
+            slow = list(self.slow)
+        rows.sort(key=lambda row: row[order_by] or 0, reverse=True)
+        return {"statements": rows, "slow": slow}
+
+    def reset(self):
+        with self._lock:
+            self.statements.clear()
+            self.slow.clear()
+
+
+registry = QueryStats()
+
+
+def _statement_text(cur, sql):
+    # The statement as sent, with parameters bound, for the slow log
+    query = cur.query if cur.query is not None else sql
+    if isinstance(query, bytes):
+        return query.decode("utf-8", "replace")
+    return str(query)
+
+
+def _explain(cur, sql, params):
+    # ANALYZE runs the statement again, so do it inside a savepoint that is
+    # rolled back; autocommit connections and named cursors only get a plan.
+    conn = cur.connection
+    text = sql.decode("utf-8", "replace") if isinstance(sql, bytes) else str(sql)
+    if not text.lstrip().lower().startswith(EXPLAINABLE):
+        return None
+    analyze = not conn.autocommit and cur.name is None
+    plain = _cursor(conn)
+    try:
+        if analyze:
+            _cursor.execute(plain, "SAVEPOINT query_stats_explain")
+        try:
+            prefix = "EXPLAIN (ANALYZE, BUFFERS) " if analyze else "EXPLAIN "
+            _cursor.execute(plain, prefix + text, params)
+            return "\n".join(row[0] for row in plain.fetchall())
+        finally:
+            if analyze:
+                _cursor.execute(plain, "ROLLBACK TO SAVEPOINT query_stats_explain")
+    except Exception as e:
+        return f"EXPLAIN failed: {e}"
+    finally:
+        plain.close()
+
+
+class InstrumentedCursor(_cursor):
+    # Drop-in cursor_factory: every execute/executemany/callproc/copy is timed
+    # and recorded under its fingerprint, errors included.
+    def _timed(self, method, sql, params, *args):
+        started = time.perf_counter()
+        error = None
+        try:
+            return method(self, sql, params, *args)
+        except Exception as e:
+            error = f"{type(e).__name__}: {str(e).strip()}"
+            raise
+        finally:
+            ms = (time.perf_counter() - started) * 1000
+            rows = self.rowcount if error is None else None
+            query = fingerprint(sql)
+            registry.record(query, ms, rows, error)
+            if ms >= registry.slow_ms:
+                plan = None
+                if error is None and registry.explain_ms and ms >= registry.explain_ms:
+                    plan = _explain(self, sql, params)
+                registry.record_slow(query, _statement_text(self, sql), ms, rows, error, plan)
+
+    def execute(self, query, vars=None):
+        return self._timed(_cursor.execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._timed(_cursor.executemany, query, vars_list)
+
+    def callproc(self, procname, parameters=None):
+        return self._timed(_cursor.callproc, procname, parameters)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._timed(_cursor.copy_expert, sql, file, size)
+
+
+def query_stats(order_by="total_ms"):
+    return registry.snapshot(order_by)
+
+
+def reset_query_stats():
+    registry.reset()
+
+
+def export_query_stats(path):
+    snapshot = query_stats()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f, indent=2, ensure_ascii=False, default=str)
+    return len(snapshot["statements"])
+
+
+def print_query_stats(limit=10):
+    snapshot = query_stats()
+    statements = snapshot["statements"]
+    if not statements:
+        print("No queries recorded.")
+        return
+    print(f"{'calls':>7} {'total ms':>10} {'mean ms':>9} {'p95 ms':>8} {'rows':>8} {'err':>4}  query")
+    for row in statements[:limit]:
+        query = row["query"] if len(row["query"]) <= 80 else row["query"][:77] + "..."
+        print(f"{row['calls']:7d} {row['total_ms']:10.1f} {row['mean_ms']:9.2f} "
+              f"{row['p95_ms'] or 0:8.1f} {row['rows']:8d} {row['errors']:4d}  {query}")
+    if snapshot["slow"]:
+        print(f"{len(snapshot['slow'])} slow queries (>= {registry.slow_ms:g} ms) in the recent log.")
@@ -0,0 +1,148 @@
+import random
+import sys
+import time
+
+from psycopg2.extras import execute_values
+
+from db import transaction, close_pool
+from snake_engine import SnakeGame
+
+# One row per verified save: the seed plus the heading used on every tick,
+# 2 bits a tick (4 ticks a byte). Re-running SnakeGame with the same seed and
+# headings reproduces the session exactly.
+GAME_REPLAY_SQL = [
+    """
+    CREATE TABLE IF NOT EXISTS game_replay (
+        id SERIAL PRIMARY KEY,
+        user_id INTEGER REFERENCES users(id) ON DELETE CASCADE,
+        username VARCHAR(50),
+        seed BIGINT NOT NULL,
+        width SMALLINT NOT NULL,
+        height SMALLINT NOT NULL,
+        ticks INTEGER NOT NULL,
+        moves BYTEA NOT NULL,
+        score INTEGER NOT NULL,
+        level INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT NOW()
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS game_replay_username_idx ON game_replay (username, score DESC)",
+]
+
+# Byte -> the four headings packed in it, lowest bits first
+_UNPACK = [tuple((byte >> shift) & 3 for shift in (0, 2, 4, 6)) for byte in range(256)]
+
+
+def new_seed():
+    # Fits a BIGINT
+    return random.SystemRandom().getrandbits(62)
+
+
+class ReplayRecorder:
+    def __init__(self, seed, width, height):
+        self.seed = seed
+        self.width = width
+        self.height = height
+        self.ticks = 0
+        self.moves = bytearray()
+
+    def record(self, direction):
+        # Heading the engine moved with this tick (UP/DOWN/LEFT/RIGHT = 0..3)
+        slot = self.ticks & 3
+        if slot == 0:
+            self.moves.append(0)
+        self.moves[-1] |= direction << (slot * 2)
+        self.ticks += 1
+
+    def snapshot(self):
+        return {
+            "seed": self.seed,
+            "width": self.width,
+            "height": self.height,
+            "ticks": self.ticks,
+            "moves": bytes(self.moves),
+        }
+
+
+def iter_moves(moves, ticks):
+    for tick in range(ticks):
+        yield _UNPACK[moves[tick >> 2]][tick & 3]
+
+
+def run_replay(replay):
+    # Headless re-simulation; returns the game as it stood after the last
+    # recorded tick, or None if the recording is inconsistent with the rules
+    # (moves recorded after the snake died, or too few bytes for the ticks).
+    moves = replay["moves"]
+    ticks = replay["ticks"]
+    if len(moves) * 4 < ticks:
+        return None
+    game = SnakeGame(replay["width"], replay["height"], seed=replay["seed"])
+    step = game.step
+    for direction in iter_moves(moves, ticks):
+        if game.done:
+            return None
+        step(direction)
+    return game
+
+
+def verify_replay(replay, score, level):
+    game = run_replay(replay)
+    return game is not None and game.score == score and game.level == level
+
+
+def save_replays(cur, rows):
+    # rows: (user_id, username, replay, score, level)
+    execute_values(
+        cur,
+        """
+        INSERT INTO game_replay (user_id, username, seed, width, height, ticks, moves, score, level)
+        VALUES %s
+        """,
+        [
+            (user_id, username, r["seed"], r["width"], r["height"], r["ticks"], r["moves"], score, level)
+            for user_id, username, r, score, level in rows
+        ]
+    )
+
+
+def load_replay(cur, replay_id):
+    cur.execute("""
+        SELECT username, seed, width, height, ticks, moves, score, level
+        FROM game_replay
+        WHERE id = %s
+    """, (replay_id,))
+    row = cur.fetchone()
+    if row is None:
+        return None
+    username, seed, width, height, ticks, moves, score, level = row
+    replay = {"seed": seed, "width": width, "height": height, "ticks": ticks, "moves": bytes(moves)}
+    return username, replay, score, level
+
+
+if __name__ == "__main__":
+    # Audit stored runs: python replay.py <replay id> [...]
+    if len(sys.argv) < 2:
+        print("usage: python replay.py REPLAY_ID [REPLAY_ID ...]")
+        sys.exit(1)
+    try:
+        for replay_id in sys.argv[1:]:
+            with transaction() as cur:
+                loaded = load_replay(cur, int(replay_id))
+            if loaded is None:
+                print(f"Replay {replay_id}: not found")
+                continue
+            username, replay, score, level = loaded
+            started = time.perf_counter()
+            game = run_replay(replay)
+            elapsed = time.perf_counter() - started
+            rate = replay["ticks"] / elapsed if elapsed > 0 else 0.0
+            if game is None:
+                print(f"Replay {replay_id} ({username}): inconsistent recording")
+            else:
+                ok = game.score == score and game.level == level
+                print(f"Replay {replay_id} ({username}): claimed {score}/L{level}, "
+                      f"replayed {game.score}/L{game.level} -> {'OK' if ok else 'MISMATCH'} "
+                      f"({replay['ticks']} ticks, {rate:.0f} ticks/s)")
+    finally:
+        close_pool()
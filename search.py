@@ -0,0 +1,105 @@
+from phones import phone_prefixes
+
+SEARCH_MODES = ("prefix", "substring", "fuzzy")
+DEFAULT_LIMIT = 50
+
+PHONE_DIGITS = "regexp_replace(phone, '[^0-9]', '', 'g')"
+
+SEARCH_INDEXES_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE INDEX IF NOT EXISTS phonebook_first_name_trgm_idx
+    ON phonebook USING gin (first_name gin_trgm_ops)
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS phonebook_phone_trgm_idx
+    ON phonebook USING gin (phone gin_trgm_ops)
+    """,
+    # Digit-only prefix lookups ("8747...") use a plain btree range scan;
+    # superseded by phonebook_phone_norm_idx (see phones.py)
+    f"""
+    CREATE INDEX IF NOT EXISTS phonebook_phone_digits_idx
+    ON phonebook (({PHONE_DIGITS}) text_pattern_ops)
+    """,
+]
+
+SEARCH_SQL = {
+    "prefix": """
+        SELECT id, first_name, phone FROM phonebook
+        WHERE first_name ILIKE %(prefix)s
+           OR (phone_norm ~>=~ %(digits)s AND phone_norm ~<~ %(digits_end)s)
+           OR (phone_norm ~>=~ %(alt_digits)s AND phone_norm ~<~ %(alt_digits_end)s)
+        ORDER BY id
+        LIMIT %(limit)s
+    """,
+    "substring": """
+        SELECT id, first_name, phone FROM phonebook
+        WHERE first_name ILIKE %(substring)s OR phone ILIKE %(substring)s
+        ORDER BY id
+        LIMIT %(limit)s
+    """,
+    "fuzzy": """
+        SELECT id, first_name, phone FROM phonebook
+        WHERE first_name %% %(pattern)s OR phone %% %(pattern)s
+        ORDER BY GREATEST(similarity(first_name, %(pattern)s), similarity(phone, %(pattern)s)) DESC, id
+        LIMIT %(limit)s
+    """,
+}
+
+# (mode, pattern, index the plan must use), checked by check_search_indexes()
+INDEX_CHECKS = [
+    ("prefix", "Ali", "phonebook_first_name_trgm_idx"),
+    ("prefix", "8747", "phonebook_phone_norm_idx"),
+    ("substring", "liha", "phonebook_first_name_trgm_idx"),
+    ("substring", "0009", "phonebook_phone_trgm_idx"),
+    ("fuzzy", "Alihan", "phonebook_first_name_trgm_idx"),
+]
+
+
+def escape_like(text):
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_params(pattern, limit=DEFAULT_LIMIT):
+    # Up to two canonical phone prefixes; an empty range (":" to ":") matches
+    # nothing, so names-only patterns skip the phone index
+    prefixes = phone_prefixes(pattern) + [None, None]
+    digits, alt_digits = prefixes[0], prefixes[1]
+    return {
+        "pattern": pattern,
+        "prefix": escape_like(pattern) + "%",
+        "substring": "%" + escape_like(pattern) + "%",
+        "digits": digits or ":",
+        "digits_end": digits + ":" if digits else ":",
+        "alt_digits": alt_digits or ":",
+        "alt_digits_end": alt_digits + ":" if alt_digits else ":",
+        "limit": limit,
+    }
+
+
+def search_phonebook(cur, pattern, mode="substring", limit=DEFAULT_LIMIT):
+    if mode not in SEARCH_SQL:
+        raise ValueError(f"Unknown search mode: {mode}")
+    cur.execute(SEARCH_SQL[mode], search_params(pattern, limit))
+    return cur.fetchall()
+
+
+def explain_search(cur, pattern, mode="substring", limit=DEFAULT_LIMIT):
+    cur.execute("EXPLAIN " + SEARCH_SQL[mode], search_params(pattern, limit))
+    return [row[0] for row in cur.fetchall()]
+
+
+def check_search_indexes(conn):
+    # On small tables the planner prefers a seq scan, so forbid it to prove
+    # that every mode can be answered from the indexes.
+    results = []
+    cur = conn.cursor()
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for mode, pattern, index in INDEX_CHECKS:
+            plan = "\n".join(explain_search(cur, pattern, mode))
+            results.append((mode, pattern, index in plan and "Seq Scan" not in plan))
+    finally:
+        conn.rollback()
+        cur.close()
+    return results
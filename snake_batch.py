@@ -0,0 +1,110 @@
+import numpy as np
+
+from snake_engine import GRID_WIDTH, GRID_HEIGHT, START_SNAKE, START_SPEED, RIGHT, DIRECTIONS, OPPOSITE
+
+DX = np.array([d[0] for d in DIRECTIONS], dtype=np.int32)
+DY = np.array([d[1] for d in DIRECTIONS], dtype=np.int32)
+OPPOSITE_ARR = np.array(OPPOSITE, dtype=np.int8)
+
+
+class BatchSnakeGame:
+    # N independent games advanced together with array operations. Same rules
+    # as SnakeGame; each snake is a ring buffer of flat cell indexes plus a
+    # per-game occupancy grid, so a step never loops over games or segments.
+    def __init__(self, n_games, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        self.n = n_games
+        self.width = width
+        self.height = height
+        self.cells = width * height
+        self.rng = np.random.default_rng(seed)
+        self._rows = np.arange(n_games)
+        self.reset()
+
+    def reset(self):
+        n, cells = self.n, self.cells
+        self.body = np.zeros((n, cells), dtype=np.int32)
+        self.occupied = np.zeros((n, cells), dtype=bool)
+        start = [y * self.width + x for x, y in reversed(START_SNAKE)]
+        self.body[:, :len(start)] = start
+        self.occupied[:, start] = True
+        self.head_pos = np.full(n, len(start) - 1, dtype=np.int32)
+        self.length = np.full(n, len(start), dtype=np.int32)
+        self.direction = np.full(n, RIGHT, dtype=np.int8)
+        self.score = np.zeros(n, dtype=np.int32)
+        self.level = np.zeros(n, dtype=np.int32)
+        self.speed = np.full(n, START_SPEED, dtype=np.int32)
+        self.ticks = np.zeros(n, dtype=np.int64)
+        self.done = np.zeros(n, dtype=bool)
+        self.food = np.zeros(n, dtype=np.int32)
+        self.food_weight = np.zeros(n, dtype=np.int32)
+        self.food_timer = np.zeros(n, dtype=np.int32)
+        self._place_food(self._rows)
+        return self.state()
+
+    def state(self):
+        return {
+            "head": self.body[self._rows, self.head_pos],
+            "length": self.length,
+            "food": self.food,
+            "direction": self.direction,
+            "score": self.score,
+            "level": self.level,
+            "speed": self.speed,
+            "done": self.done,
+        }
+
+    def _place_food(self, games):
+        if len(games) == 0:
+            return
+        # Highest random key over the free cells = uniform pick among them
+        keys = self.rng.random((len(games), self.cells))
+        keys[self.occupied[games]] = -1.0
+        cells = keys.argmax(axis=1)
+        full = keys[np.arange(len(games)), cells] < 0
+        self.done[games[full]] = True
+        self.food[games] = cells
+        self.food_weight[games] = self.rng.integers(1, 4, len(games))
+        self.food_timer[games] = self.rng.integers(30, 61, len(games))
+
+    def step(self, actions=None):
+        rows = self._rows
+        active = ~self.done
+        if actions is not None:
+            actions = np.asarray(actions, dtype=np.int8)
+            turn = active & (actions >= 0) & (actions != OPPOSITE_ARR[self.direction])
+            self.direction[turn] = actions[turn]
+        self.ticks[active] += 1
+
+        head = self.body[rows, self.head_pos]
+        nx = head % self.width + DX[self.direction]
+        ny = head // self.width + DY[self.direction]
+        wall = (nx < 0) | (nx >= self.width) | (ny < 0) | (ny >= self.height)
+        new_cell = np.where(wall, 0, ny * self.width + nx)
+
+        cap = self.cells
+        tail_pos = (self.head_pos - self.length + 1) % cap
+        tail = self.body[rows, tail_pos]
+        hit_self = self.occupied[rows, new_cell] & (new_cell != tail)
+
+        dies = active & (wall | hit_self)
+        self.done |= dies
+        moving = active & ~dies
+        eats = moving & (new_cell == self.food)
+        slides = moving & ~eats
+
+        self.occupied[rows[slides], tail[slides]] = False
+        self.head_pos[moving] = (self.head_pos[moving] + 1) % cap
+        self.body[rows[moving], self.head_pos[moving]] = new_cell[moving]
+        self.occupied[rows[moving], new_cell[moving]] = True
+        self.length[eats] += 1
+
+        reward = np.where(eats, self.food_weight, 0)
+        self.score += reward
+        level_up = eats & (self.score % 5 == 0)
+        self.level[level_up] += 1
+        self.speed[level_up] += 1
+
+        self.food_timer[slides] -= 1
+        respawn = eats | (slides & (self.food_timer <= 0))
+        self._place_food(rows[respawn])
+        return self.state(), reward, self.done.copy()
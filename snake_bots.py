@@ -0,0 +1,133 @@
+import random
+from abc import ABC, abstractmethod
+from collections import deque
+
+from snake_engine import DIRECTIONS, OPPOSITE
+
+# (width, height) -> neighbour table, see neighbours()
+_NEIGHBOURS = {}
+
+
+class Bot(ABC):
+    # A bot sees the live SnakeGame and returns the action for the next tick
+    # (UP/DOWN/LEFT/RIGHT, or None to keep going straight).
+    name = "bot"
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+
+    def reset(self, game):
+        pass
+
+    @abstractmethod
+    def act(self, game):
+        pass
+
+
+def safe_moves(game):
+    # Actions whose next cell is on the board and not body; the tail cell is
+    # fine since it moves away this tick (unless the snake eats there)
+    head_x, head_y = game.snake[0]
+    tail = game.snake[-1]
+    moves = []
+    for action, (dx, dy) in enumerate(DIRECTIONS):
+        if action == OPPOSITE[game.direction]:
+            continue
+        x, y = head_x + dx, head_y + dy
+        if 0 <= x < game.width and 0 <= y < game.height:
+            if not game.occupied[y * game.width + x] or (x, y) == tail:
+                moves.append((action, x, y))
+    return moves
+
+
+def neighbours(width, height):
+    # Cell index -> indices of its on-board neighbours, cached per board size
+    key = (width, height)
+    table = _NEIGHBOURS.get(key)
+    if table is None:
+        table = []
+        for cell in range(width * height):
+            x, y = cell % width, cell // width
+            table.append(tuple(
+                (y + dy) * width + x + dx for dx, dy in DIRECTIONS
+                if 0 <= x + dx < width and 0 <= y + dy < height
+            ))
+        _NEIGHBOURS[key] = table
+    return table
+
+
+def reachable_area(game, start, limit):
+    # Free cells reachable from start, counted up to limit
+    x, y = start
+    start = y * game.width + x
+    adjacent = neighbours(game.width, game.height)
+    seen = bytearray(game.occupied)
+    seen[start] = 1
+    queue = deque([start])
+    count = 1
+    while queue and count < limit:
+        for cell in adjacent[queue.popleft()]:
+            if not seen[cell]:
+                seen[cell] = 1
+                queue.append(cell)
+                count += 1
+    return count
+
+
+class RandomBot(Bot):
+    # Any move that does not die on the spot
+    name = "random"
+
+    def act(self, game):
+        moves = safe_moves(game)
+        return self.rng.choice(moves)[0] if moves else None
+
+
+class PathBot(Bot):
+    # BFS shortest path to the food over the current body. Takes the first
+    # step if it leaves enough room to keep moving; otherwise, or with no
+    # path, heads for the biggest open area.
+    name = "bfs"
+
+    def first_step(self, game, moves):
+        width = game.width
+        adjacent = neighbours(width, game.height)
+        goal_x, goal_y = game.food["pos"]
+        goal = goal_y * width + goal_x
+        seen = bytearray(game.occupied)
+        first = {}
+        queue = deque()
+        for action, x, y in moves:
+            cell = y * width + x
+            seen[cell] = 1
+            first[cell] = action
+            queue.append(cell)
+        while queue:
+            cell = queue.popleft()
+            if cell == goal:
+                return first[cell]
+            for nxt in adjacent[cell]:
+                if not seen[nxt]:
+                    seen[nxt] = 1
+                    first[nxt] = first[cell]
+                    queue.append(nxt)
+        return None
+
+    def act(self, game):
+        moves = safe_moves(game)
+        if not moves:
+            return None
+        needed = len(game.snake) + 1
+        action = self.first_step(game, moves)
+        if action is not None:
+            for candidate, x, y in moves:
+                if candidate == action and reachable_area(game, (x, y), needed) >= needed:
+                    return action
+        best = max(moves, key=lambda m: (reachable_area(game, (m[1], m[2]), needed), self.rng.random()))
+        return best[0]
+
+
+BOTS = {
+    RandomBot.name: RandomBot,
+    PathBot.name: PathBot,
+}
@@ -0,0 +1,184 @@
+import random
+import sys
+import time
+from collections import deque
+
+GRID_WIDTH, GRID_HEIGHT = 40, 30
+
+# Actions are indexes into DIRECTIONS; None keeps the current heading
+UP, DOWN, LEFT, RIGHT = 0, 1, 2, 3
+DIRECTIONS = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+OPPOSITE = [DOWN, UP, RIGHT, LEFT]
+
+START_SNAKE = [(5, 5), (4, 5), (3, 5)]
+START_SPEED = 10
+
+
+class SnakeGame:
+    # Game rules only: no pygame, no clock, so it can run as fast as Python allows
+    def __init__(self, width=GRID_WIDTH, height=GRID_HEIGHT, seed=None):
+        self.width = width
+        self.height = height
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        self.rng = random.Random(self.seed)
+        self.score = 0
+        self.level = 0
+        self.speed = START_SPEED
+        self.ticks = 0
+        self.done = False
+        self.place_snake(START_SNAKE)
+        self.food = self.generate_food()
+        return self.state()
+
+    def place_snake(self, segments):
+        # Head first. Occupancy is a flat bytearray grid; free cells live in a
+        # list with a reverse index so both can be updated in O(1).
+        cells = self.width * self.height
+        self.snake = deque(segments)
+        self.occupied = bytearray(cells)
+        self.free = list(range(cells))
+        self.free_index = list(range(cells))
+        for x, y in self.snake:
+            self._occupy(y * self.width + x)
+        if len(self.snake) > 1:
+            (head_x, head_y), (neck_x, neck_y) = self.snake[0], self.snake[1]
+            self.direction = DIRECTIONS.index((head_x - neck_x, head_y - neck_y))
+
+    def _occupy(self, cell):
+        self.occupied[cell] = 1
+        index = self.free_index[cell]
+        last = self.free.pop()
+        if last != cell:
+            self.free[index] = last
+            self.free_index[last] = index
+
+    def _release(self, cell):
+        self.occupied[cell] = 0
+        self.free_index[cell] = len(self.free)
+        self.free.append(cell)
+
+    def state(self):
+        # Read-only view of the live game, not a copy
+        return {
+            "snake": self.snake,
+            "food": self.food,
+            "direction": self.direction,
+            "score": self.score,
+            "level": self.level,
+            "speed": self.speed,
+            "ticks": self.ticks,
+        }
+
+    def generate_food(self):
+        # Sample straight from the free cells; no retries as the board fills up
+        if not self.free:
+            return None
+        cell = self.free[self.rng.randrange(len(self.free))]
+        weight = self.rng.randint(1, 3)
+        timer = self.rng.randint(30, 60)
+        # Random bright color for food
+        color = (
+            self.rng.randint(128, 255),
+            self.rng.randint(128, 255),
+            self.rng.randint(128, 255)
+        )
+        pos = (cell % self.width, cell // self.width)
+        return {"pos": pos, "weight": weight, "timer": timer, "color": color}
+
+    def turn(self, action):
+        if action is not None and action != OPPOSITE[self.direction]:
+            self.direction = action
+
+    def step(self, action=None):
+        if self.done:
+            return self.state(), 0, True
+        self.turn(action)
+        self.ticks += 1
+
+        head_x, head_y = self.snake[0]
+        dx, dy = DIRECTIONS[self.direction]
+        new_x, new_y = head_x + dx, head_y + dy
+
+        if new_x < 0 or new_x >= self.width or new_y < 0 or new_y >= self.height:
+            self.done = True
+            return self.state(), 0, True
+        new_head = (new_x, new_y)
+        new_cell = new_y * self.width + new_x
+        # The tail moves away this tick, so running into it is allowed
+        if self.occupied[new_cell] and new_head != self.snake[-1]:
+            self.done = True
+            return self.state(), 0, True
+
+        reward = 0
+        if new_head == self.food["pos"]:
+            self.snake.appendleft(new_head)
+            self._occupy(new_cell)
+            reward = self.food["weight"]
+            self.score += reward
+            if self.score % 5 == 0:
+                self.level += 1
+                self.speed += 1
+            self.food = self.generate_food()
+        else:
+            tail_x, tail_y = self.snake.pop()
+            self._release(tail_y * self.width + tail_x)
+            self.snake.appendleft(new_head)
+            self._occupy(new_cell)
+            self.food["timer"] -= 1
+            if self.food["timer"] <= 0:
+                self.food = self.generate_food()
+        if self.food is None:
+            # Snake fills the whole board
+            self.done = True
+        return self.state(), reward, self.done
+
+
+def hamiltonian_cycle(width, height):
+    # Serpentine over columns 1.. and back up column 0; needs an even height
+    path = []
+    for y in range(height):
+        xs = range(1, width) if y % 2 == 0 else range(width - 1, 0, -1)
+        path.extend((x, y) for x in xs)
+    path.extend((0, y) for y in range(height - 1, -1, -1))
+    return path
+
+
+def benchmark_tick_cost(width=GRID_WIDTH, height=GRID_HEIGHT, ticks=20000, fractions=(0.01, 0.25, 0.5, 0.75, 0.95)):
+    # Walks the snake along a Hamiltonian cycle so it never dies, at
+    # increasing lengths, and reports the average cost of one step().
+    cycle = hamiltonian_cycle(width, height)
+    following = {cell: cycle[(i + 1) % len(cycle)] for i, cell in enumerate(cycle)}
+    results = []
+    for fraction in fractions:
+        length = max(3, int(len(cycle) * fraction))
+        game = SnakeGame(width, height, seed=1)
+        # Head first, i.e. walking the cycle backwards from the head
+        game.place_snake([cycle[(length - 1 - i) % len(cycle)] for i in range(length)])
+        game.food = game.generate_food()
+        actions = {delta: action for action, delta in enumerate(DIRECTIONS)}
+        started = time.perf_counter()
+        steps = 0
+        while steps < ticks and not game.done:
+            x, y = game.snake[0]
+            nx, ny = following[(x, y)]
+            game.step(actions[(nx - x, ny - y)])
+            steps += 1
+            if len(game.snake) > len(cycle) * 0.98:
+                # Shrink back to the measured length; not part of the tick cost
+                paused = time.perf_counter()
+                game.place_snake([cycle[(length - 1 - i) % len(cycle)] for i in range(length)])
+                started += time.perf_counter() - paused
+        elapsed = time.perf_counter() - started
+        results.append((length, steps, elapsed / steps * 1e6))
+    return results
+
+
+if __name__ == "__main__":
+    width = int(sys.argv[1]) if len(sys.argv) > 1 else GRID_WIDTH
+    height = int(sys.argv[2]) if len(sys.argv) > 2 else GRID_HEIGHT
+    print(f"Tick cost on a {width}x{height} grid:")
+    for length, steps, micros in benchmark_tick_cost(width, height):
+        print(f"  length {length:6d}: {micros:7.2f} us/tick over {steps} ticks")
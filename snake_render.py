@@ -0,0 +1,103 @@
+import pygame
+
+BACKGROUND_COLOR = (30, 30, 30)
+TEXT_COLOR = (255, 255, 255)
+TEXT_CACHE_LIMIT = 256
+
+
+class SnakeRenderer:
+    # Everything that does not depend on the frame is built once up front:
+    # the 360-entry hue palette, one rounded segment sprite per hue and the
+    # rendered HUD strings. Each frame only touches the cells that changed
+    # and pushes those rectangles with pygame.display.update(rects).
+    def __init__(self, screen, font, block_size, background=BACKGROUND_COLOR, text_color=TEXT_COLOR):
+        self.screen = screen
+        self.font = font
+        self.block_size = block_size
+        self.background = background
+        self.text_color = text_color
+        self.palette = []
+        for hue in range(360):
+            color = pygame.Color(0)
+            color.hsva = (hue, 100, 100, 100)
+            self.palette.append(color)
+        self.sprites = [self._segment_sprite(color) for color in self.palette]
+        self.text_cache = {}
+        self.hud = {}
+        self.previous = []
+        self.full_redraw = True
+
+    def _segment_sprite(self, color):
+        size = self.block_size
+        sprite = pygame.Surface((size, size), pygame.SRCALPHA)
+        pygame.draw.rect(sprite, color, (0, 0, size, size), border_radius=4)
+        return sprite.convert_alpha() if pygame.display.get_surface() else sprite
+
+    def text(self, text, color=None):
+        key = (text, color or self.text_color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            if len(self.text_cache) >= TEXT_CACHE_LIMIT:
+                self.text_cache.clear()
+            surface = self.font.render(text, True, key[1])
+            self.text_cache[key] = surface
+        return surface
+
+    def draw(self, snake, food, hue, hud_lines):
+        screen = self.screen
+        size = self.block_size
+        dirty = []
+        erased = []
+
+        if self.full_redraw:
+            screen.fill(self.background)
+            self.hud = {}
+        else:
+            # Rounded sprites leave corners untouched, so clear last frame's cells
+            erased.extend(self.previous)
+
+        # Lines that are no longer shown (e.g. stats toggled off) get erased
+        positions = {pos for _, pos in hud_lines}
+        for pos in [pos for pos in self.hud if pos not in positions]:
+            erased.append(self.hud.pop(pos)[1])
+
+        hud = []
+        for text, pos in hud_lines:
+            surface = self.text(text)
+            rect = surface.get_rect(topleft=pos)
+            old = self.hud.get(pos)
+            changed = old is None or old[0] != text
+            if changed and old is not None:
+                erased.append(old[1])
+            hud.append((text, pos, surface, rect, changed))
+
+        for rect in erased:
+            screen.fill(self.background, rect)
+        dirty.extend(erased)
+
+        current = []
+        # Positions may be fractional cells when the loop interpolates between ticks
+        for i, (x, y) in enumerate(snake):
+            sprite = self.sprites[(hue + i * 10) % 360]
+            current.append(screen.blit(sprite, (round(x * size), round(y * size))))
+
+        if food is not None:
+            fx, fy = food["pos"]
+            center = (fx * size + size // 2, fy * size + size // 2)
+            radius = size // 2 - 2
+            current.append(pygame.draw.circle(screen, food["color"], center, radius))
+        dirty.extend(current)
+
+        # HUD goes on top; unchanged text nothing was drawn over stays as is
+        for text, pos, surface, rect, changed in hud:
+            if changed or rect.collidelist(dirty) != -1:
+                screen.blit(surface, rect)
+                dirty.append(rect)
+                self.hud[pos] = (text, rect)
+
+        self.previous = current
+        if self.full_redraw:
+            pygame.display.flip()
+            self.full_redraw = False
+        else:
+            pygame.display.update(dirty)
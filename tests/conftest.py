@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+TEST_SCHEMA = f"phonebook_test_{os.getpid()}"
+
+
+@pytest.fixture(scope="module")
+def scratch_conn():
+    # A migrated scratch schema on the database in PHONEBOOK_DSN; skipped
+    # when that is unset or unreachable so the suite runs without a server
+    import psycopg2
+    from migrations import SCHEMA_VERSION_SQL, migrate
+
+    dsn = os.environ.get("PHONEBOOK_DSN")
+    if not dsn:
+        pytest.skip("PHONEBOOK_DSN not set")
+    try:
+        conn = psycopg2.connect(dsn, options=f"-c search_path={TEST_SCHEMA},public")
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"database unreachable: {e}")
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cur.fetchone() is None:
+                pytest.skip("pg_trgm is not available on this server")
+            cur.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+            cur.execute(f"CREATE SCHEMA {TEST_SCHEMA}")
+            # Shadows public's schema_version so migrate() starts from scratch
+            cur.execute(SCHEMA_VERSION_SQL)
+        conn.commit()
+        migrate(conn, ("core",))
+        yield conn
+    finally:
+        conn.rollback()
+        with conn.cursor() as cur:
+            cur.execute(f"DROP SCHEMA IF EXISTS {TEST_SCHEMA} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+@pytest.fixture(scope="module")
+def procedures_conn(scratch_conn):
+    # scratch_conn with the procedures component on top. Only the scratch
+    # schema is on the path while migrating, so the legacy DROPs in
+    # procedures v2 cannot reach public's routines.
+    from migrations import migrate
+
+    with scratch_conn.cursor() as cur:
+        cur.execute(f"SET search_path = {TEST_SCHEMA}")
+        scratch_conn.commit()
+        try:
+            migrate(scratch_conn, ("procedures",))
+        finally:
+            cur.execute("RESET search_path")
+            scratch_conn.commit()
+    return scratch_conn
@@ -0,0 +1,46 @@
+import cache
+from cache import TTLCache
+
+
+def by_value(key, value):
+    return value
+
+
+def test_invalidate_tagged_drops_only_tagged_entries():
+    c = TTLCache(10, 60, index=by_value)
+    c.set("a", ("1", "2"))
+    c.set("b", ("2",))
+    c.set("c", ("3",))
+    c.invalidate_tagged({"2"})
+    assert c.get("a") == (False, None)
+    assert c.get("b") == (False, None)
+    assert c.get("c") == (True, ("3",))
+
+
+def test_reverse_index_follows_overwrites_and_evictions():
+    c = TTLCache(2, 60, index=by_value)
+    c.set("a", ("1",))
+    c.set("a", ("2",))
+    c.set("b", ("3",))
+    c.set("c", ("4",))          # evicts "a"
+    assert c._by_tag == {"3": {"b"}, "4": {"c"}}
+    c.clear()
+    assert c._by_tag == {}
+
+
+def test_invalidate_contacts_uses_both_directions():
+    cache.invalidate_all()
+    cache.phones_by_name.set("Ann", ("8 747 000 00 01",))
+    cache.phones_by_name.set("Bob", ("555",))
+    cache.name_by_phone.set("77470000001", "Ann")
+    cache.name_by_phone.set("555", "Bob")
+    try:
+        cache.invalidate_contacts(phones=["+7 747 000 00 01"])
+        assert not cache.phones_by_name.get("Ann")[0]
+        assert not cache.name_by_phone.get("77470000001")[0]
+        assert cache.phones_by_name.get("Bob")[0]
+        cache.invalidate_contacts(names=["Bob"])
+        assert not cache.phones_by_name.get("Bob")[0]
+        assert not cache.name_by_phone.get("555")[0]
+    finally:
+        cache.invalidate_all()
@@ -0,0 +1,55 @@
+import os
+import select
+
+import pytest
+
+from change_feed import CHANNEL, DictMirror, parse_change
+
+
+def test_parse_change_drops_the_sequence_number():
+    assert parse_change('["U", 4, "Ann", "8747", 3]') == ("U", 4, "Ann", "8747")
+    assert parse_change('["T", 1]') == ("T", None, None, None)
+    assert parse_change('["R", 2]') == ("R", None, None, None)
+
+
+def test_replace_keeps_serving_the_old_copy():
+    mirror = DictMirror()
+    mirror.load([(1, "Ann", "8 747 000 00 01")])
+    seen = []
+
+    def rows():
+        seen.append(mirror.lookup_name("+77470000001"))
+        yield (2, "Bob", "555")
+
+    mirror.replace(rows())
+    assert seen == ["Ann"]
+    assert mirror.lookup_name("+77470000001") is None
+    assert mirror.lookup_phones("Bob") == ("555",)
+
+
+def test_repeated_values_in_one_transaction_all_arrive(procedures_conn):
+    import psycopg2
+
+    listener = psycopg2.connect(os.environ["PHONEBOOK_DSN"])
+    listener.autocommit = True
+    try:
+        with procedures_conn.cursor() as cur:
+            cur.execute("INSERT INTO phonebook (first_name, phone) VALUES ('A', '101') RETURNING id")
+            row_id = cur.fetchone()[0]
+        procedures_conn.commit()
+        mirror = DictMirror()
+        mirror.load([(row_id, "A", "101")])
+        with listener.cursor() as cur:
+            cur.execute(f"LISTEN {CHANNEL}")
+        with procedures_conn.cursor() as cur:
+            for name in ("B", "A", "B"):
+                cur.execute("UPDATE phonebook SET first_name = %s WHERE id = %s", (name, row_id))
+        procedures_conn.commit()
+        select.select([listener], [], [], 5)
+        listener.poll()
+        changes = [parse_change(n.payload) for n in listener.notifies if n.channel == CHANNEL]
+        assert [change[2] for change in changes] == ["B", "A", "B"]
+        mirror.apply(changes)
+        assert mirror.lookup_phones("B") == ("101",)
+    finally:
+        listener.close()
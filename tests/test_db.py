@@ -0,0 +1,49 @@
+import threading
+import time
+
+import psycopg2.pool
+
+import db
+
+
+class FakeConnection:
+    def __init__(self, *args, **kwargs):
+        self.closed = 0
+
+    def close(self):
+        self.closed = 1
+
+
+def test_connection_waits_for_a_free_slot(monkeypatch):
+    monkeypatch.setattr(psycopg2.pool.psycopg2, "connect", FakeConnection)
+    monkeypatch.setenv("PHONEBOOK_POOL_MIN", "0")
+    monkeypatch.setenv("PHONEBOOK_POOL_MAX", "2")
+    db.close_pool()
+    in_use = []
+    most = []
+    errors = []
+    lock = threading.Lock()
+
+    def work():
+        try:
+            with db.connection() as conn:
+                with lock:
+                    in_use.append(conn)
+                    most.append(len(in_use))
+                time.sleep(0.01)
+                with lock:
+                    in_use.remove(conn)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        db.close_pool()
+    assert errors == []
+    assert len(most) == 8
+    assert max(most) <= 2
@@ -0,0 +1,35 @@
+from fast_csv import scan_block
+
+
+def test_scan_block_valid_rows():
+    out = []
+    rows, lines, rejects = scan_block(b"Ann, 87470000001\r\nBob,87470000002\n", 1, 0, out)
+    assert (rows, lines, rejects) == (2, 2, [])
+    assert out == [b"1,Ann,87470000001\n", b"2,Bob,87470000002\n"]
+
+
+def test_scan_block_seq_base_and_first_line():
+    out = []
+    scan_block(b"Ann, 1\n", 10, 5 << 32, out)
+    assert out == [b"%d,Ann,1\n" % ((5 << 32) + 10)]
+
+
+def test_scan_block_rejects():
+    out = []
+    block = b"Bad\n,123\nAnn,\nA,1,2\nLong," + b"1" * 25 + b"\n"
+    rows, lines, rejects = scan_block(block, 1, 0, out)
+    assert rows == 0 and lines == 5 and out == []
+    assert [(line, reason) for line, row, reason in rejects] == [
+        (1, "expected 2 columns"),
+        (2, "empty name"),
+        (3, "empty phone"),
+        (4, "expected 2 columns"),
+        (5, "phone longer than 20"),
+    ]
+
+
+def test_scan_block_quoted_fallback():
+    out = []
+    rows, lines, rejects = scan_block(b'"Smith, J", 8700\n', 1, 0, out)
+    assert (rows, rejects) == (1, [])
+    assert out == [b'1,"Smith, J",8700\n']
@@ -0,0 +1,52 @@
+import pytest
+
+from game_loop import FixedStepLoop, InputQueue, interpolate
+from snake_engine import UP, DOWN, LEFT, RIGHT
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ticks_due_follow_tick_rate():
+    timer = FakeTimer()
+    loop = FixedStepLoop(8, timer=timer)
+    assert loop.frame() == 0
+    timer.now = 0.0625
+    assert loop.frame() == 0
+    assert loop.alpha == pytest.approx(0.5)
+    timer.now = 0.3125
+    assert loop.frame() == 2
+    assert loop.alpha == pytest.approx(0.5)
+
+
+def test_stall_drops_excess_ticks():
+    timer = FakeTimer()
+    loop = FixedStepLoop(8, max_ticks_per_frame=5, timer=timer)
+    loop.frame()
+    timer.now = 2.0
+    assert loop.frame() == 5
+    assert loop.stats()["dropped_ticks"] == 11
+    assert loop.alpha < 1.0
+
+
+def test_input_queue_buffers_turns():
+    queue = InputQueue(size=2)
+    assert queue.push(UP, RIGHT)
+    assert not queue.push(UP, RIGHT)      # repeat of the queued heading
+    assert not queue.push(DOWN, RIGHT)    # reversal of the queued heading
+    assert queue.push(LEFT, RIGHT)
+    assert not queue.push(DOWN, RIGHT)    # full
+    assert (queue.pop(), queue.pop(), queue.pop()) == (UP, LEFT, None)
+
+
+def test_interpolate():
+    previous = [(1, 1), (0, 1)]
+    current = [(2, 1), (1, 1), (0, 1)]
+    assert interpolate(previous, current, 0.5) == [(1.5, 1.0), (0.5, 1.0), (0, 1)]
+    assert interpolate(previous, current, 1.0) == current
+    assert interpolate([], current, 0.5) == current
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from leaderboard import TopBoard
+
+WHEN = datetime(2026, 1, 1)
+
+
+def test_keeps_best_n_sorted():
+    board = TopBoard(size=3)
+    for name, score in (("a", 5), ("b", 9), ("c", 1), ("d", 7)):
+        board.record(name, score, 1, WHEN)
+    assert [(name, score) for name, score, _, _ in board.top()] == [("b", 9), ("d", 7), ("a", 5)]
+
+
+def test_only_improvements_count():
+    board = TopBoard(size=3)
+    board.load([("a", 5, 1, WHEN), ("b", 3, 1, WHEN)])
+    assert not board.record("a", 4, 1, WHEN)
+    assert board.record("b", 8, 2, WHEN)
+    assert [(name, score, level) for name, score, level, _ in board.top()] == [("b", 8, 2), ("a", 5, 1)]
+
+
+def test_below_cutoff_is_ignored():
+    board = TopBoard(size=2)
+    board.load([("a", 5, 1, WHEN), ("b", 3, 1, WHEN)])
+    assert not board.record("c", 3, 1, WHEN)
+    assert board.record("c", 4, 1, WHEN)
+    assert [name for name, _, _, _ in board.top()] == ["a", "c"]
+    assert board.top(1) == [("a", 5, 1, WHEN)]
@@ -0,0 +1,24 @@
+import importlib
+
+import pytest
+
+app = importlib.import_module("11")
+
+
+@pytest.mark.parametrize("limit", [0, -5, 2.5, "10", True])
+def test_fetch_page_rejects_bad_page_size(monkeypatch, limit):
+    def no_query():
+        raise AssertionError("queried with a bad page size")
+
+    monkeypatch.setattr(app, "transaction", no_query)
+    with pytest.raises(ValueError):
+        app.fetch_page(0, limit)
+
+
+@pytest.mark.parametrize("answer", ["0", "-3", "ten", ""])
+def test_pagination_prompt_rejects_bad_page_size(monkeypatch, capsys, answer):
+    answers = iter([answer])
+    monkeypatch.setattr("builtins.input", lambda prompt="": next(answers))
+    monkeypatch.setattr(app, "fetch_page", lambda *args: pytest.fail("fetched a page"))
+    app.query_with_pagination()
+    assert "positive whole number" in capsys.readouterr().out
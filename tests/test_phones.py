@@ -0,0 +1,33 @@
+from phones import normalize_phone, phone_key, phone_prefixes
+
+
+def test_normalize_phone_formats():
+    assert normalize_phone("8 (747) 123-45-67") == "77471234567"
+    assert normalize_phone("+7 747 123 45 67") == "77471234567"
+    assert normalize_phone("87471234567") == "77471234567"
+
+
+def test_normalize_phone_keeps_other_numbers():
+    # Only 11-digit numbers carry the 8 trunk prefix
+    assert normalize_phone("87471") == "87471"
+    assert normalize_phone("101") == "101"
+    assert normalize_phone(None) is None
+
+
+def test_phone_key():
+    assert phone_key("8 747 123 45 67") == "77471234567"
+    assert phone_key("Alihan") is None
+    assert phone_key("") is None
+    assert phone_key("+7-747-123-45-67") == "77471234567"
+
+
+def test_phone_key_ignores_names_with_digits():
+    assert phone_key("Room 101") is None
+    assert phone_key("Alihan2") is None
+    assert phone_key("101") == "101"
+
+
+def test_phone_prefixes():
+    assert phone_prefixes("8747") == ["7747", "8747"]
+    assert phone_prefixes("+7747") == ["7747"]
+    assert phone_prefixes("Ali") == []
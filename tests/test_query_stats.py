@@ -0,0 +1,21 @@
+from query_stats import fingerprint
+
+
+def test_literals_become_placeholders():
+    assert fingerprint("SELECT * FROM t WHERE a = 'x' AND b = 42") == "SELECT * FROM t WHERE a = ? AND b = ?"
+
+
+def test_driver_placeholders():
+    assert fingerprint("SELECT * FROM t WHERE a = %s AND b = %(name)s") == "SELECT * FROM t WHERE a = ? AND b = ?"
+
+
+def test_lists_rows_and_arrays_collapse():
+    assert fingerprint("SELECT 1 FROM t WHERE c IN (1, 2, 3)") == "SELECT ? FROM t WHERE c IN (?)"
+    assert fingerprint("INSERT INTO t (a, b) VALUES (1, 'a'), (2, 'b')") == "INSERT INTO t (a, b) VALUES (?)"
+    assert fingerprint("SELECT 1 FROM t WHERE x = ANY(ARRAY[1,2,3])") == "SELECT ? FROM t WHERE x = ANY(ARRAY[?])"
+
+
+def test_same_shape_same_fingerprint():
+    a = fingerprint("SELECT id FROM phonebook  WHERE first_name = 'Ann' -- lookup\n")
+    b = fingerprint(b"SELECT id FROM phonebook WHERE first_name = 'Bob'")
+    assert a == b == "SELECT id FROM phonebook WHERE first_name = ?"
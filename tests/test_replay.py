@@ -0,0 +1,41 @@
+import random
+
+from replay import ReplayRecorder, iter_moves, run_replay, verify_replay
+from snake_engine import SnakeGame
+
+
+def play(seed, ticks=500):
+    rng = random.Random(seed)
+    game = SnakeGame(seed=seed)
+    recorder = ReplayRecorder(seed, game.width, game.height)
+    while not game.done and game.ticks < ticks:
+        game.step(rng.choice([None, 0, 1, 2, 3]))
+        recorder.record(game.direction)
+    return game, recorder.snapshot()
+
+
+def test_pack_unpack_round_trip():
+    headings = [random.Random(7).randrange(4) for _ in range(13)]
+    recorder = ReplayRecorder(1, 20, 20)
+    for heading in headings:
+        recorder.record(heading)
+    replay = recorder.snapshot()
+    assert replay["ticks"] == 13
+    assert len(replay["moves"]) == 4
+    assert list(iter_moves(replay["moves"], replay["ticks"])) == headings
+
+
+def test_replay_reproduces_game():
+    for seed in range(5):
+        game, replay = play(seed)
+        replayed = run_replay(replay)
+        assert replayed is not None
+        assert (replayed.score, replayed.level, replayed.ticks) == (game.score, game.level, game.ticks)
+        assert verify_replay(replay, game.score, game.level)
+
+
+def test_tampered_replays_fail():
+    game, replay = play(3)
+    assert not verify_replay(replay, game.score + 1, game.level)
+    truncated = dict(replay, moves=replay["moves"][:-1], ticks=replay["ticks"] + 8)
+    assert run_replay(truncated) is None
@@ -0,0 +1,43 @@
+import pytest
+
+from search import INDEX_CHECKS, SEARCH_MODES, check_search_indexes, explain_search
+
+
+@pytest.fixture(scope="module")
+def search_conn(scratch_conn):
+    # Mostly rows the check patterns miss, so the index is the cheap plan
+    # for the few that match, not an ordered walk of the primary key
+    with scratch_conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO phonebook (first_name, phone)
+            SELECT CASE WHEN g % 500 = 0 THEN 'Alihan' || g ELSE md5(g::text) END,
+                   CASE WHEN g % 500 = 0 THEN '8747' ELSE '8701' END || lpad(g::text, 7, '0')
+            FROM generate_series(1, 20000) AS g
+        """)
+        cur.execute("ANALYZE phonebook")
+    scratch_conn.commit()
+    return scratch_conn
+
+
+def test_every_mode_is_checked():
+    assert {mode for mode, _, _ in INDEX_CHECKS} == set(SEARCH_MODES)
+
+
+def test_check_search_indexes(search_conn):
+    results = check_search_indexes(search_conn)
+    assert len(results) == len(INDEX_CHECKS)
+    failed = [(mode, pattern) for mode, pattern, ok in results if not ok]
+    assert not failed, f"search not served by its index: {failed}"
+
+
+@pytest.mark.parametrize("mode,pattern,index", INDEX_CHECKS)
+def test_plan_uses_index_scan(search_conn, mode, pattern, index):
+    cur = search_conn.cursor()
+    try:
+        cur.execute("SET LOCAL enable_seqscan = off")
+        plan = "\n".join(explain_search(cur, pattern, mode))
+    finally:
+        search_conn.rollback()
+        cur.close()
+    assert any(scan in plan for scan in ("Index Scan", "Index Only Scan", "Bitmap Index Scan")), plan
+    assert index in plan, plan
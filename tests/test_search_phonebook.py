@@ -0,0 +1,40 @@
+import pytest
+
+from search import SEARCH_MODES
+
+
+@pytest.fixture(scope="module")
+def search_conn(procedures_conn):
+    with procedures_conn.cursor() as cur:
+        cur.execute("""
+            INSERT INTO phonebook (first_name, phone) VALUES
+                ('Alihan', '8 747 123 45 67'),
+                ('Aliya', '+7 701 000 00 01'),
+                ('Bolat', '87470000002')
+        """)
+    procedures_conn.commit()
+    return procedures_conn
+
+
+CASES = [
+    ("prefix", "Ali", {"Alihan", "Aliya"}),
+    ("prefix", "8747", {"Alihan", "Bolat"}),
+    ("prefix", "+7 701", {"Aliya"}),
+    ("substring", "liha", {"Alihan"}),
+    ("substring", "000", {"Aliya", "Bolat"}),
+    ("fuzzy", "Alihan", {"Alihan"}),
+]
+
+
+def test_every_mode_is_covered():
+    assert {mode for mode, _, _ in CASES} == set(SEARCH_MODES)
+
+
+@pytest.mark.parametrize("mode,pattern,expected", CASES)
+def test_search_phonebook_function(search_conn, mode, pattern, expected):
+    with search_conn.cursor() as cur:
+        cur.execute("SELECT first_name FROM search_phonebook(%s, %s)", (pattern, mode))
+        found = {row[0] for row in cur.fetchall()}
+    search_conn.rollback()
+    assert expected <= found
+
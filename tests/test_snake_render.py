@@ -0,0 +1,38 @@
+import os
+
+import pytest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+pygame = pytest.importorskip("pygame")
+
+from snake_render import BACKGROUND_COLOR, SnakeRenderer
+
+
+@pytest.fixture
+def renderer():
+    pygame.init()
+    screen = pygame.display.set_mode((200, 200))
+    yield SnakeRenderer(screen, pygame.font.Font(None, 20), 10)
+    pygame.quit()
+
+
+def painted(screen, rect):
+    return sum(
+        1
+        for x in range(rect.left, rect.right)
+        for y in range(rect.top, rect.bottom)
+        if screen.get_at((x, y))[:3] != BACKGROUND_COLOR
+    )
+
+
+def test_hidden_hud_line_is_erased(renderer):
+    snake = [(15, 15), (14, 15)]
+    lines = [("Score: 1", (5, 5)), ("60 fps, frame 1.0 ms", (5, 100))]
+    renderer.draw(snake, None, 0, lines)
+    stats_rect = renderer.hud[(5, 100)][1]
+    assert painted(renderer.screen, stats_rect) > 0
+
+    renderer.draw(snake, None, 0, lines[:1])
+    assert (5, 100) not in renderer.hud
+    assert painted(renderer.screen, stats_rect) == 0
+    assert painted(renderer.screen, renderer.hud[(5, 5)][1]) > 0
@@ -0,0 +1,226 @@
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from psycopg2.extras import execute_values
+
+from db import connection, transaction, close_pool
+from migrations import migrate
+from players import get_or_create_users
+from progress_writer import LEADERBOARD_UPSERT_SQL
+from snake_engine import SnakeGame, GRID_WIDTH, GRID_HEIGHT
+from snake_bots import BOTS
+from replay import ReplayRecorder, save_replays, verify_replay
+
+DEFAULT_MAX_TICKS = 5000
+GAMES_PER_TASK = 20
+
+
+def play_game(bot, seed, width=GRID_WIDTH, height=GRID_HEIGHT, max_ticks=DEFAULT_MAX_TICKS, record=True):
+    game = SnakeGame(width, height, seed=seed)
+    recorder = ReplayRecorder(seed, width, height) if record else None
+    bot.reset(game)
+    level_ticks = []
+    while not game.done and game.ticks < max_ticks:
+        level = game.level
+        game.step(bot.act(game))
+        if recorder is not None:
+            recorder.record(game.direction)
+        if game.level != level:
+            level_ticks.append(game.ticks)
+    return {
+        "seed": seed,
+        "score": game.score,
+        "level": game.level,
+        "ticks": game.ticks,
+        "length": len(game.snake),
+        "timed_out": not game.done,
+        "level_ticks": level_ticks,
+        "replay": recorder.snapshot() if recorder is not None else None,
+    }
+
+
+def play_games(bot_name, seeds, width, height, max_ticks, record):
+    # Runs in a worker process; one bot instance per task
+    bot = BOTS[bot_name](seeds[0])
+    started = time.perf_counter()
+    results = [play_game(bot, seed, width, height, max_ticks, record) for seed in seeds]
+    return bot_name, results, time.perf_counter() - started
+
+
+def run_tournament(bot_names, games, workers=None, width=GRID_WIDTH, height=GRID_HEIGHT,
+                   max_ticks=DEFAULT_MAX_TICKS, seed=0, record=True, on_results=None):
+    # Every bot plays the same seeds, so scores are comparable game by game
+    seeds = [seed * 1_000_003 + i for i in range(games)]
+    tasks = [
+        (bot_name, seeds[i:i + GAMES_PER_TASK])
+        for bot_name in bot_names
+        for i in range(0, games, GAMES_PER_TASK)
+    ]
+    results = {bot_name: [] for bot_name in bot_names}
+    cpu_seconds = {bot_name: 0.0 for bot_name in bot_names}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_games, bot_name, chunk, width, height, max_ticks, record)
+                   for bot_name, chunk in tasks]
+        for future in futures:
+            bot_name, chunk_results, seconds = future.result()
+            results[bot_name].extend(chunk_results)
+            cpu_seconds[bot_name] += seconds
+            if on_results:
+                on_results(bot_name, chunk_results)
+    return results, cpu_seconds, time.perf_counter() - started
+
+
+# Results -> users / user_score / leaderboard / game_replay
+def bot_usernames(bot_name, players):
+    return [f"bot_{bot_name}_{i:03d}" for i in range(players)]
+
+
+def write_results(results, players, user_ids):
+    # The whole tournament in one transaction: every game to user_score (and
+    # its replay to game_replay), each account's best to the leaderboard.
+    # Games whose replay does not re-simulate to the recorded score and level
+    # are left out. -> (games written, games rejected)
+    scores, best, replays = [], {}, []
+    rejected = 0
+    for bot_name, games in results.items():
+        names = bot_usernames(bot_name, players)
+        for i, result in enumerate(games):
+            username = names[i % players]
+            score_level = (result["score"], result["level"])
+            replay = result["replay"]
+            if replay is not None and not verify_replay(replay, *score_level):
+                rejected += 1
+                continue
+            scores.append((user_ids[username], *score_level))
+            if username not in best or score_level[0] > best[username][0]:
+                best[username] = score_level
+            if replay is not None:
+                replays.append((user_ids[username], username, replay, *score_level))
+    if scores:
+        with transaction() as cur:
+            execute_values(cur, "INSERT INTO user_score (user_id, score, level) VALUES %s", scores)
+            # One row per username: ON CONFLICT cannot touch a row twice
+            execute_values(cur, LEADERBOARD_UPSERT_SQL,
+                           [(username, *score_level) for username, score_level in best.items()])
+            if replays:
+                save_replays(cur, replays)
+    return len(scores), rejected
+
+
+# Reporting
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(games, cpu_seconds):
+    scores = sorted(g["score"] for g in games)
+    ticks = sum(g["ticks"] for g in games)
+    levels = {}
+    for g in games:
+        levels[g["level"]] = levels.get(g["level"], 0) + 1
+    # Level pacing: average tick at which each level was reached
+    reached = {}
+    for g in games:
+        for level, tick in enumerate(g["level_ticks"], 1):
+            reached.setdefault(level, []).append(tick)
+    return {
+        "games": len(games),
+        "games_per_sec": len(games) / cpu_seconds if cpu_seconds > 0 else None,
+        "ticks_per_sec": ticks / cpu_seconds if cpu_seconds > 0 else None,
+        "timed_out": sum(1 for g in games if g["timed_out"]),
+        "score": {
+            "mean": sum(scores) / len(scores) if scores else None,
+            "min": scores[0] if scores else None,
+            "p25": percentile(scores, 25),
+            "p50": percentile(scores, 50),
+            "p75": percentile(scores, 75),
+            "p90": percentile(scores, 90),
+            "max": scores[-1] if scores else None,
+        },
+        "levels": {str(level): count for level, count in sorted(levels.items())},
+        "ticks_to_level": {
+            str(level): sum(t) / len(t) for level, t in sorted(reached.items())
+        },
+    }
+
+
+def print_summary(bot_name, summary):
+    s = summary["score"]
+    print(f"\n{bot_name}: {summary['games']} games, {summary['games_per_sec']:.1f} games/s "
+          f"per worker, {summary['ticks_per_sec']:.0f} ticks/s, {summary['timed_out']} hit the tick limit")
+    print(f"  score mean {s['mean']:.1f}, min {s['min']}, p25 {s['p25']}, median {s['p50']}, "
+          f"p75 {s['p75']}, p90 {s['p90']}, max {s['max']}")
+    print("  final level: " + ", ".join(f"L{level} x{count}" for level, count in summary["levels"].items()))
+    if summary["ticks_to_level"]:
+        print("  avg tick reaching level: " + ", ".join(
+            f"L{level} @{tick:.0f}" for level, tick in summary["ticks_to_level"].items()))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless snake bot tournament.")
+    parser.add_argument("--bots", nargs="+", default=list(BOTS), choices=list(BOTS))
+    parser.add_argument("--games", type=int, default=1000, help="games per bot")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    parser.add_argument("--width", type=int, default=GRID_WIDTH)
+    parser.add_argument("--height", type=int, default=GRID_HEIGHT)
+    parser.add_argument("--max-ticks", type=int, default=DEFAULT_MAX_TICKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--players", type=int, default=10,
+                        help="bot accounts per bot; games are spread over them")
+    parser.add_argument("--no-db", action="store_true", help="do not write results to the database")
+    parser.add_argument("--no-replays", action="store_true", help="do not record or store replays")
+    parser.add_argument("--json", default=None, help="write the summary to this JSON file")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    write = not args.no_db
+    user_ids = {}
+    if write:
+        with connection() as conn:
+            migrate(conn, ("core",))
+        for bot_name in args.bots:
+            players = get_or_create_users(bot_usernames(bot_name, args.players))
+            user_ids.update((name, p["user_id"]) for name, p in players.items())
+
+    written = {bot_name: 0 for bot_name in args.bots}
+
+    def on_results(bot_name, games):
+        written[bot_name] += len(games)
+        print(f"  {bot_name}: {written[bot_name]}/{args.games} games", end="\r")
+
+    try:
+        results, cpu_seconds, wall = run_tournament(
+            args.bots, args.games, args.workers, args.width, args.height,
+            args.max_ticks, args.seed, record=not args.no_replays, on_results=on_results
+        )
+        if write:
+            _, rejected = write_results(results, args.players, user_ids)
+            if rejected:
+                print(f"\n{rejected} games did not match their replay and were not written.")
+    finally:
+        if write:
+            close_pool()
+
+    total = sum(len(games) for games in results.values())
+    summaries = {bot_name: summarize(games, cpu_seconds[bot_name]) for bot_name, games in results.items()}
+    for bot_name, summary in summaries.items():
+        print_summary(bot_name, summary)
+    print(f"\n{total} games in {wall:.1f}s: {total / wall:.1f} games/s overall with "
+          f"{args.workers or os.cpu_count()} workers" + (", results written to the database" if write else ""))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"wall_seconds": wall, "bots": summaries}, f, indent=2, sort_keys=True)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])